@@ -1,18 +1,32 @@
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.tools import Tool
 from langchain.prompts import ChatPromptTemplate
-from typing import Dict
+from typing import Dict, Iterator, List, Optional, Tuple
 from config import Config
-from utils import setup_logger
+from scraper import ReferenceCache
+from verification import PartIndex
+from utils import setup_logger, REGISTRY, timed
 
 logger = setup_logger(__name__)
 
+OCR_CACHE = REGISTRY.counter('ic_ocr_cache_total', "OCR result cache lookups by result (hit, miss)", ['result'])
+WRITE_FAILURES = REGISTRY.counter('ic_db_write_failures_total', "Batch inspection records that could not be saved")
+
+def _check_written(future, image_path: str):
+    """Report a batch record the background writer failed to save (it was already yielded)"""
+    error = future.exception()
+    if error is not None:
+        WRITE_FAILURES.inc()
+        logger.error("Failed to save inspection of %s: %s", image_path, error)
+
 class ICInspectionAgent:
     def __init__(self, ocr_engine, scraper, verifier, db_manager):
         self.ocr_engine = ocr_engine
         self.scraper = scraper
         self.verifier = verifier
         self.db_manager = db_manager
+        self.reference_cache = ReferenceCache(scraper, db_manager)
+        self.part_index = PartIndex.build_from_db(db_manager)
         
         self.llm = ChatGoogleGenerativeAI(
             model=Config.LLM_MODEL,
@@ -33,7 +47,7 @@ class ICInspectionAgent:
             ),
             Tool(
                 name="search_datasheet",
-                func=lambda args: self.scraper.extract_marking_info(args['part'], args['oem']),
+                func=lambda args: self.reference_cache.get(args['part'], args['oem']),
                 description="Search for datasheet and marking information"
             ),
             Tool(
@@ -49,21 +63,15 @@ class ICInspectionAgent:
         # Using direct workflow instead
         return None
     
-    def inspect(self, image_path: str, part_number: str, oem_name: str) -> Dict:
-        """Run complete inspection workflow"""
-        logger.info(f"Starting inspection: {part_number} from {oem_name}")
-        
-        # Extract text
-        ocr_result = self.ocr_engine.extract_from_image_path(image_path)
-        
-        # Get reference data
-        reference = self.scraper.extract_marking_info(part_number, oem_name)
-        
-        # Verify
-        verification = self.verifier.verify_marking(ocr_result['text'], reference)
+    def _build_inspection(self, image_path: str, part_number: str, oem_name: str,
+                          ocr_result: Dict, reference: Dict, station_id: Optional[str] = None) -> Dict:
+        """Verify an OCR result against reference data and assemble the inspection record"""
+        candidates = self.part_index.lookup(ocr_result['text'], k=Config.PART_CANDIDATES)
+        verification = self.verifier.verify_marking(
+            ocr_result['text'], reference, candidates, ocr_result.get('words')
+        )
         
-        # Save to database
-        inspection_data = {
+        return {
             'image_path': image_path,
             'part_number': part_number,
             'oem_name': oem_name,
@@ -72,10 +80,168 @@ class ICInspectionAgent:
             'status': verification['status'],
             'confidence': verification['confidence'],
             'differences': verification['differences'],
+            'difference_details': verification['difference_details'],
             'reference_markings': reference,
-            'datasheet_url': reference.get('datasheet_url')
+            'datasheet_url': reference.get('datasheet_url'),
+            'candidates': verification['candidates'],
+            'relabel_suspect': verification['relabel_suspect'],
+            'field_scores': verification['field_scores'],
+            'station_id': station_id
         }
+    
+    def _extract_text(self, image, part_number: str, oem_name: str,
+                      image_hash: Optional[str] = None, profile: Optional[str] = None) -> Dict:
+        """
+        Run OCR, reusing the memoized result when this exact image was seen before
+        With early exit the result is only reused for the same claimed part and OEM
+        """
+        if not image_hash or not Config.OCR_RESULT_CACHE:
+            return self.ocr_engine.extract_from_image(image, part_number, oem_name, profile)
+        
+        config_version = self.ocr_engine.version_for(profile, part_number, oem_name)
+        cached = self.db_manager.get_ocr_result(image_hash, config_version)
+        if cached is not None:
+            OCR_CACHE.inc(result='hit')
+            cached['cached'] = True
+            return cached
+        
+        OCR_CACHE.inc(result='miss')
+        ocr_result = self.ocr_engine.extract_from_image(image, part_number, oem_name, profile)
+        self.db_manager.save_ocr_result(image_hash, config_version, ocr_result)
+        return ocr_result
+    
+    def _identify_part(self, extracted_text: str, oem_name: Optional[str]) -> Tuple[str, str]:
+        """Pick the known part that best matches the marking"""
+        candidates = self.part_index.lookup(extracted_text, k=1)
+        if not candidates or candidates[0]['score'] < Config.PART_ID_MIN_SCORE:
+            raise ValueError("Part number not provided and could not be identified from the marking")
+        
+        best = candidates[0]
+        logger.info("Identified part %s (score: %s%%)", best['part_number'], best['score'])
+        return best['part_number'], oem_name or best['oem_name'] or ''
+    
+    @timed('inspect')
+    def inspect(self, image_path: str, part_number: str, oem_name: str,
+                image_hash: Optional[str] = None, image=None, profile: Optional[str] = None,
+                station_id: Optional[str] = None) -> Dict:
+        """
+        Run complete inspection workflow
+        When image (encoded bytes or a decoded array) is given it is OCR'd directly
+        and image_path is only recorded. An empty part_number is filled in from
+        the closest known part. profile overrides the preprocessing profile and
+        station_id the configured STATION_ID the inspection is counted under.
+        """
+        logger.info("Starting inspection: %s from %s", part_number, oem_name)
+        
+        # Extract text
+        ocr_result = self._extract_text(image if image is not None else image_path,
+                                        part_number, oem_name, image_hash, profile)
+        
+        # Identify the part from the marking when the operator didn't enter it
+        if not part_number:
+            part_number, oem_name = self._identify_part(ocr_result['text'], oem_name)
+        
+        # Get reference data
+        reference = self.reference_cache.get(part_number, oem_name)
         
-        self.db_manager.save_inspection(inspection_data)
+        # Verify
+        inspection_data = self._build_inspection(image_path, part_number, oem_name, ocr_result, reference,
+                                                 station_id)
+        
+        # Save to database (group-committed with concurrent inspections); a failed write raises
+        self.db_manager.writer.write(inspection_data)
+        self.part_index.add(part_number, oem_name)
         
         return inspection_data
+    
+    @timed('inspect_tray')
+    def inspect_tray(self, image_path: str, part_number: str, oem_name: str, image=None,
+                     profile: Optional[str] = None, station_id: Optional[str] = None) -> List[Dict]:
+        """
+        Inspect every IC detected in one frame (e.g. a tray photo)
+        Each chip becomes its own inspection, with its 'region' and 'region_index'
+        in the frame. An empty part_number is identified per chip; chips that
+        cannot be identified get status ERROR.
+        """
+        ocr_results = self.ocr_engine.extract_from_regions(
+            image if image is not None else image_path, part_number or None, oem_name or None, profile
+        )
+        logger.info("Tray inspection: %s ICs detected in %s", len(ocr_results), image_path)
+        
+        inspections = []
+        for index, ocr_result in enumerate(ocr_results):
+            try:
+                chip_part, chip_oem = part_number, oem_name
+                if not chip_part:
+                    chip_part, chip_oem = self._identify_part(ocr_result['text'], oem_name)
+                reference = self.reference_cache.get(chip_part, chip_oem)
+                inspection_data = self._build_inspection(image_path, chip_part, chip_oem, ocr_result, reference,
+                                                         station_id)
+            except Exception as e:
+                logger.error("Tray region %s failed: %s", index, e)
+                inspection_data = {
+                    'image_path': image_path,
+                    'part_number': part_number,
+                    'oem_name': oem_name,
+                    'extracted_text': ocr_result['text'],
+                    'status': 'ERROR',
+                    'error': str(e)
+                }
+            inspection_data['region_index'] = index
+            inspection_data['region'] = ocr_result['region']
+            inspections.append(inspection_data)
+        
+        verified = [inspection for inspection in inspections if inspection['status'] != 'ERROR']
+        for future in self.db_manager.writer.submit_many(verified, flush=True):
+            future.result()
+        for inspection in verified:
+            self.part_index.add(inspection['part_number'], inspection['oem_name'])
+        
+        return inspections
+    
+    def inspect_batch(self, items: List[Dict], max_workers: Optional[int] = None,
+                      profile: Optional[str] = None) -> Iterator[Tuple[int, Dict]]:
+        """
+        Run the inspection workflow over many images
+        
+        Args:
+            items: Dicts with image_path, part_number, oem_name and optionally station_id
+            max_workers: Number of OCR processes (defaults to Config.BATCH_MAX_WORKERS)
+            profile: Preprocessing profile (defaults to Config.PREPROCESSING_PROFILE)
+        
+        Yields:
+            (index, inspection data) as each image finishes; failed images get
+            status ERROR and an error message instead of stopping the batch
+        """
+        # Fetch reference data once per unique part, concurrently
+        references = self.reference_cache.get_many([(item['part_number'], item['oem_name']) for item in items])
+        logger.info("Batch inspection: %s images, %s unique parts", len(items), len(references))
+        
+        ocr_items = [(item['image_path'], item['part_number'], item['oem_name']) for item in items]
+        for index, ocr_result in self.ocr_engine.extract_many(ocr_items, max_workers, profile):
+            image_path, part_number, oem_name = ocr_items[index]
+            try:
+                if isinstance(ocr_result, Exception):
+                    raise ocr_result
+                inspection_data = self._build_inspection(
+                    image_path, part_number, oem_name, ocr_result, references[(part_number, oem_name)],
+                    items[index].get('station_id')
+                )
+                self.db_manager.writer.submit(inspection_data).add_done_callback(
+                    lambda future, image_path=image_path: _check_written(future, image_path)
+                )
+            except Exception as e:
+                logger.error("Batch item failed: %s: %s", image_path, e)
+                inspection_data = {
+                    'image_path': image_path,
+                    'part_number': part_number,
+                    'oem_name': oem_name,
+                    'status': 'ERROR',
+                    'error': str(e)
+                }
+            
+            yield index, inspection_data
+        
+        self.db_manager.writer.flush()
+        for part_number, oem_name in references:
+            self.part_index.add(part_number, oem_name)
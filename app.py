@@ -1,13 +1,19 @@
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Query
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
-import os
-import shutil
-from datetime import datetime
+from starlette.concurrency import run_in_threadpool
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from typing import List, Optional, Tuple
 from main import ICInspectionSystem
 from config import Config
-from utils import setup_logger
+from ocr import ImageProcessor
+from utils import (
+    setup_logger, read_addressed, write_if_missing, BoundedExecutor, ExecutorSaturatedError, JobQueue,
+    REGISTRY
+)
 
 logger = setup_logger(__name__)
 
@@ -25,6 +31,38 @@ app.add_middleware(
 # Initialize system
 system = ICInspectionSystem()
 
+# Inspections block on OpenCV, Tesseract, HTTP and the database, so they run on
+# a bounded pool; requests beyond its queue get 503 instead of piling up
+inspection_executor = BoundedExecutor(
+    max_workers=Config.API_MAX_CONCURRENT_INSPECTIONS,
+    max_queued=Config.API_MAX_QUEUED_INSPECTIONS,
+    name='inspect'
+)
+
+# Uploads are decoded from memory; writing the original to disk happens here,
+# off the latency-critical path
+persist_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='persist')
+
+# Queue behind POST /inspect?mode=async; results are collected via /jobs/{job_id}
+job_queue = JobQueue(
+    num_workers=Config.API_JOB_WORKERS,
+    max_pending=Config.API_JOB_MAX_PENDING,
+    result_ttl=Config.API_JOB_RESULT_TTL,
+    name='inspect_jobs'
+)
+
+PERSIST_FAILURES = REGISTRY.counter(
+    'ic_upload_persist_failures_total', "Uploaded images that could not be written to disk"
+)
+
+# Work waiting or running, read when /metrics is scraped
+REGISTRY.gauge('ic_inspections_in_flight', "Inspections running or queued on the API executor").set_function(
+    lambda: inspection_executor.in_flight
+)
+REGISTRY.gauge('ic_jobs_pending', "Async inspection jobs waiting for a worker").set_function(
+    lambda: job_queue.pending
+)
+
 @app.get("/", response_class=HTMLResponse)
 async def home():
     """Serve the main web interface"""
@@ -59,7 +97,7 @@ async def home():
                 margin-bottom: 5px;
                 font-weight: bold;
             }
-            input[type="text"], input[type="file"] {
+            input[type="text"], input[type="file"], select {
                 width: 100%;
                 padding: 10px;
                 border: 1px solid #ddd;
@@ -108,11 +146,24 @@ async def home():
                 </div>
                 <div class="form-group">
                     <label>Part Number:</label>
-                    <input type="text" name="part_number" placeholder="e.g., LM358" required>
+                    <input type="text" name="part_number" placeholder="e.g., LM358 (leave empty to identify)">
                 </div>
                 <div class="form-group">
                     <label>OEM Name:</label>
-                    <input type="text" name="oem_name" placeholder="e.g., Texas Instruments" required>
+                    <input type="text" name="oem_name" placeholder="e.g., Texas Instruments">
+                </div>
+                <div class="form-group">
+                    <label>Preprocessing Profile:</label>
+                    <select name="profile">
+                        <option value="">Default</option>
+                        <option value="fast">Fast</option>
+                        <option value="balanced">Balanced</option>
+                        <option value="accurate">Accurate</option>
+                    </select>
+                </div>
+                <div class="form-group">
+                    <label>Station (optional):</label>
+                    <input type="text" name="station_id" placeholder="e.g., LINE1">
                 </div>
                 <button type="submit">Verify IC</button>
             </form>
@@ -140,6 +191,7 @@ async def home():
                     resultDiv.innerHTML = `
                         <h2>Verification Result</h2>
                         <p><strong>Status:</strong> ${data.status}</p>
+                        <p><strong>Part Number:</strong> ${data.part_number}</p>
                         <p><strong>Confidence:</strong> ${(data.confidence * 100).toFixed(2)}%</p>
                         <p><strong>Extracted Text:</strong> ${data.extracted_text}</p>
                         <p><strong>OCR Confidence:</strong> ${data.ocr_confidence.toFixed(2)}%</p>
@@ -160,47 +212,255 @@ async def home():
     </html>
     """
 
+def _receive_upload(image: UploadFile) -> Tuple[bytes, str, str]:
+    """
+    Read an upload into memory, hashing it as it is read, and queue it for content-addressed storage
+    Returns (image bytes, file path, SHA-256); the file is written in the background
+    """
+    data, filepath, image_hash = read_addressed(image.file, Config.UPLOAD_FOLDER, image.filename or '')
+    persist_executor.submit(write_if_missing, filepath, data).add_done_callback(
+        lambda future: _check_persisted(future, filepath)
+    )
+    return data, filepath, image_hash
+
+def _check_persisted(future, filepath: str):
+    """Report an upload the background writer failed to store (the inspection still references it)"""
+    error = future.exception()
+    if error is not None:
+        PERSIST_FAILURES.inc()
+        logger.error("Failed to persist upload %s: %s", filepath, error)
+
+def _receive_and_inspect(image: UploadFile, part_number: str, oem_name: str, profile: Optional[str] = None,
+                         station_id: Optional[str] = None):
+    """Read the upload and run the inspection (blocking, runs on the inspection executor)"""
+    data, filepath, image_hash = _receive_upload(image)
+    
+    logger.info("Processing inspection: %s from %s", part_number, oem_name)
+    return system.inspect_ic(filepath, part_number, oem_name, image_hash, image=data, profile=profile,
+                             station_id=station_id)
+
+def _receive_and_inspect_tray(image: UploadFile, part_number: str, oem_name: str, profile: Optional[str] = None,
+                              station_id: Optional[str] = None):
+    """Read a tray photo and inspect every IC in it (blocking, runs on the inspection executor)"""
+    data, filepath, _ = _receive_upload(image)
+    
+    logger.info("Processing tray inspection: %s from %s", part_number, oem_name)
+    return system.inspect_tray(filepath, part_number, oem_name, image=data, profile=profile, station_id=station_id)
+
+def _check_profile(profile: str) -> Optional[str]:
+    """Validate a preprocessing profile form field; empty means the configured default"""
+    if not profile:
+        return None
+    if profile not in ImageProcessor.PROFILES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown profile '{profile}', expected one of {', '.join(ImageProcessor.PROFILES)}"
+        )
+    return profile
+
+def _saturated_error() -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail="Inspection capacity reached, retry later",
+        headers={"Retry-After": str(Config.API_RETRY_AFTER)}
+    )
+
 @app.post("/inspect")
 async def inspect_ic(
     image: UploadFile = File(...),
-    part_number: str = Form(...),
-    oem_name: str = Form(...)
+    part_number: str = Form(""),
+    oem_name: str = Form(""),
+    profile: str = Form(""),
+    station_id: str = Form(""),
+    mode: str = Query(Config.API_INSPECT_MODE, pattern="^(sync|async)$")
 ):
-    """Handle IC inspection request"""
+    """
+    Handle IC inspection request
+    In async mode the request is queued and a job id is returned immediately.
+    Leave part_number empty to identify the part from its marking, and profile
+    empty to use the configured preprocessing profile. station_id defaults to
+    the configured STATION_ID.
+    """
+    profile = _check_profile(profile)
     try:
-        # Save uploaded image
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"{timestamp}_{image.filename}"
-        filepath = os.path.join(Config.UPLOAD_FOLDER, filename)
-        
-        with open(filepath, "wb") as buffer:
-            shutil.copyfileobj(image.file, buffer)
-        
-        logger.info(f"Processing inspection: {part_number} from {oem_name}")
+        if mode == "async":
+            data, filepath, image_hash = await run_in_threadpool(_receive_upload, image)
+            job = job_queue.submit(system.inspect_ic, filepath, part_number, oem_name, image_hash, data, profile,
+                                   station_id or None)
+            logger.info("Queued inspection job %s: %s from %s", job.id, part_number, oem_name)
+            return JSONResponse(status_code=202, content={
+                'job_id': job.id,
+                'status': job.status,
+                'status_url': f"/jobs/{job.id}",
+                'result_url': f"/jobs/{job.id}/result"
+            })
         
-        # Run inspection
-        result = system.inspect_ic(filepath, part_number, oem_name)
+        # Run the blocking decode + inspection off the event loop
+        result = await inspection_executor.run(_receive_and_inspect, image, part_number, oem_name, profile,
+                                              station_id or None)
         
         return JSONResponse(content=result)
     
+    except ExecutorSaturatedError:
+        raise _saturated_error()
     except Exception as e:
-        logger.error(f"Inspection error: {e}")
+        logger.error("Inspection error: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/inspect/tray")
+async def inspect_tray(
+    image: UploadFile = File(...),
+    part_number: str = Form(""),
+    oem_name: str = Form(""),
+    profile: str = Form(""),
+    station_id: str = Form("")
+):
+    """
+    Inspect every IC visible in one photo (e.g. a tray)
+    Returns one inspection per detected chip
+    """
+    profile = _check_profile(profile)
+    try:
+        results = await inspection_executor.run(_receive_and_inspect_tray, image, part_number, oem_name, profile,
+                                                station_id or None)
+        return JSONResponse(content={'count': len(results), 'inspections': results})
+    
+    except ExecutorSaturatedError:
+        raise _saturated_error()
+    except Exception as e:
+        logger.error("Tray inspection error: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Get the status (and result, once finished) of an inspection job"""
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return JSONResponse(content=job.to_dict())
+
+@app.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str, wait: float = Query(30.0, ge=0)):
+    """
+    Long-poll for a job result, waiting up to `wait` seconds
+    Returns 200 once the job has finished, 202 if it is still pending
+    """
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    if not job.done:
+        await asyncio.wait([asyncio.wrap_future(job.future)], timeout=min(wait, Config.API_JOB_MAX_WAIT))
+    
+    return JSONResponse(status_code=200 if job.done else 202, content=job.to_dict())
+
 @app.get("/history")
 async def get_history():
     """Get recent inspection history"""
     try:
-        records = system.db_manager.get_recent_inspections(limit=20)
+        rows, _ = await run_in_threadpool(system.db_manager.get_inspection_history, limit=20)
         return JSONResponse(content=[{
-            'id': r.id,
-            'timestamp': r.timestamp.isoformat(),
-            'part_number': r.part_number,
-            'status': r.status,
-            'confidence': r.confidence
-        } for r in records])
+            'id': r['id'],
+            'timestamp': r['timestamp'].isoformat(),
+            'part_number': r['part_number'],
+            'status': r['status'],
+            'confidence': r['confidence']
+        } for r in rows])
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/inspections")
+async def list_inspections(
+    limit: int = Query(Config.HISTORY_PAGE_SIZE, ge=1, le=Config.HISTORY_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    part_number: Optional[str] = None,
+    oem_name: Optional[str] = None,
+    status: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    difference_code: Optional[str] = None,
+    difference_field: Optional[str] = None
+):
+    """
+    Page through inspection summaries, newest first
+    Pass the returned next_cursor to get the following page; it is null on the last one.
+    difference_code / difference_field select inspections failing on e.g. 'date_code'.
+    """
+    try:
+        rows, next_cursor = await run_in_threadpool(
+            system.db_manager.get_inspection_history, limit, cursor,
+            part_number, oem_name, status, since, until, difference_code, difference_field
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return JSONResponse(content={
+        'items': [dict(r, timestamp=r['timestamp'].isoformat()) for r in rows],
+        'next_cursor': next_cursor
+    })
+
+@app.get("/stats")
+async def get_stats(
+    group_by: List[str] = Query(['part_number']),
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+    part_number: Optional[str] = None,
+    oem_name: Optional[str] = None,
+    station_id: Optional[str] = None
+):
+    """
+    Genuine/fake/uncertain counts and rates per group, read from the rollups
+    group_by is repeatable: day, part_number, oem_name and/or station_id; an
+    empty group_by gives one overall row.
+    """
+    group_by = [name for name in group_by if name]
+    try:
+        groups = await run_in_threadpool(
+            system.db_manager.get_stats, group_by, since, until, part_number, oem_name, station_id
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    for group in groups:
+        if 'day' in group:
+            group['day'] = group['day'].isoformat()
+    return JSONResponse(content={'group_by': group_by, 'groups': groups})
+
+@app.get("/stats/confidence")
+async def get_confidence_histogram(
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+    part_number: Optional[str] = None,
+    oem_name: Optional[str] = None,
+    station_id: Optional[str] = None
+):
+    """Verification confidence histogram per status, for tuning SIMILARITY_THRESHOLD"""
+    try:
+        bins = await run_in_threadpool(
+            system.db_manager.get_confidence_histogram, since, until, part_number, oem_name, station_id
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    return JSONResponse(content={
+        'similarity_threshold': Config.SIMILARITY_THRESHOLD,
+        'bins': bins
+    })
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Stage timings, counters and queue depths in the Prometheus text format"""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+@app.on_event("shutdown")
+def shutdown():
+    """Finish in-flight inspections and release worker pools"""
+    inspection_executor.shutdown(wait=True)
+    job_queue.shutdown(wait=True)
+    persist_executor.shutdown(wait=True)
+    system.ocr_engine.shutdown()
+    system.db_manager.close()
 
 if __name__ == "__main__":
     import uvicorn
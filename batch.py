@@ -0,0 +1,117 @@
+"""
+Batch inspection of IC image lots
+
+Usage:
+    python batch.py DIRECTORY --part LM358 --oem "Texas Instruments" [--station LINE1]
+                    [--output results.jsonl]
+    python batch.py manifest.csv [--station LINE1] [--output results.jsonl]
+
+A manifest is a CSV file with image_path, part_number and oem_name columns and
+an optional station_id column (defaulting to --station); relative image paths
+are resolved against the manifest's directory.
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+from typing import Dict, List, Optional
+
+from ocr import ImageProcessor
+from utils import setup_logger
+
+logger = setup_logger(__name__)
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff')
+
+
+def load_manifest(manifest_path: str, station_id: Optional[str] = None) -> List[Dict]:
+    """Load batch items from a CSV manifest"""
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    items = []
+    with open(manifest_path, newline='') as f:
+        for row in csv.DictReader(f):
+            image_path = row['image_path'].strip()
+            if not os.path.isabs(image_path):
+                image_path = os.path.join(base_dir, image_path)
+            items.append({
+                'image_path': image_path,
+                'part_number': row['part_number'].strip(),
+                'oem_name': row['oem_name'].strip(),
+                'station_id': (row.get('station_id') or '').strip() or station_id
+            })
+    logger.info("Loaded %s items from manifest: %s", len(items), manifest_path)
+    return items
+
+
+def collect_directory(directory: str, part_number: str, oem_name: str,
+                      station_id: Optional[str] = None) -> List[Dict]:
+    """Build batch items for every image in a directory, all of the same part"""
+    items = [
+        {
+            'image_path': os.path.join(directory, filename),
+            'part_number': part_number,
+            'oem_name': oem_name,
+            'station_id': station_id
+        }
+        for filename in sorted(os.listdir(directory))
+        if filename.lower().endswith(IMAGE_EXTENSIONS)
+    ]
+    logger.info("Found %s images in %s", len(items), directory)
+    return items
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect a lot of IC images")
+    parser.add_argument('source', help="Directory of images or CSV manifest")
+    parser.add_argument('--part', help="Part number (required for a directory)")
+    parser.add_argument('--oem', help="OEM name (required for a directory)")
+    parser.add_argument('--workers', type=int, default=None, help="Number of OCR processes")
+    parser.add_argument('--profile', choices=list(ImageProcessor.PROFILES), default=None,
+                        help="Preprocessing profile (defaults to PREPROCESSING_PROFILE)")
+    parser.add_argument('--station', default=None,
+                        help="Station the results are counted under (defaults to STATION_ID)")
+    parser.add_argument('--output', help="Write one JSON result per line to this file")
+    args = parser.parse_args()
+    
+    if os.path.isdir(args.source):
+        if not args.part or not args.oem:
+            parser.error("--part and --oem are required when inspecting a directory")
+        items = collect_directory(args.source, args.part, args.oem, args.station)
+    else:
+        items = load_manifest(args.source, args.station)
+    
+    if not items:
+        print("No images to inspect")
+        return 1
+    
+    from main import ICInspectionSystem
+    system = ICInspectionSystem()
+    
+    output = open(args.output, 'w') if args.output else None
+    counts = {}
+    try:
+        for done, (index, result) in enumerate(system.inspect_batch(items, args.workers, args.profile), start=1):
+            counts[result['status']] = counts.get(result['status'], 0) + 1
+            if result['status'] == 'ERROR':
+                detail = result.get('error') or 'unknown error'
+            else:
+                detail = f"{result['confidence']:.2%}"
+            print(f"[{done}/{len(items)}] {os.path.basename(result['image_path'])}: "
+                  f"{result['status']} ({detail})")
+            if output:
+                output.write(json.dumps({'index': index, **result}, default=str) + '\n')
+                output.flush()
+    finally:
+        if output:
+            output.close()
+    
+    print("\nBatch Summary:")
+    for status, count in sorted(counts.items()):
+        print(f"  {status}: {count}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
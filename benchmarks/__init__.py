@@ -0,0 +1,4 @@
+from .profiles import compare_profiles, load_labels
+from .synthetic import generate_dataset, render_marking
+
+__all__ = ['compare_profiles', 'load_labels', 'generate_dataset', 'render_marking']
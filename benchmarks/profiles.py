@@ -0,0 +1,133 @@
+"""
+Compare preprocessing profiles on a labeled image set
+
+Usage:
+    python -m benchmarks.profiles labels.csv [--profiles fast balanced accurate] [--output report.json]
+
+labels.csv has image_path and expected_text columns; relative image paths are
+resolved against the CSV's directory. For each profile the report gives the
+preprocessing and OCR time per image and how well the OCR text matches the label:
+exact_match_rate is the share of images whose OCR tokens include every token of
+the label.
+"""
+
+import argparse
+import csv
+import json
+import os
+import statistics
+import sys
+import time
+from typing import Dict, List, Optional
+
+from fuzzywuzzy import fuzz
+
+from ocr import ImageProcessor, OCREngine
+from utils import setup_logger
+from verification.part_index import normalize_part
+
+logger = setup_logger(__name__)
+
+
+def load_labels(labels_path: str) -> List[Dict]:
+    """Load (image_path, expected_text) pairs from a CSV file"""
+    base_dir = os.path.dirname(os.path.abspath(labels_path))
+    samples = []
+    with open(labels_path, newline='') as f:
+        for row in csv.DictReader(f):
+            image_path = row['image_path'].strip()
+            if not os.path.isabs(image_path):
+                image_path = os.path.join(base_dir, image_path)
+            samples.append({'image_path': image_path, 'expected_text': row['expected_text'].strip()})
+    logger.info("Loaded %s labeled images from %s", len(samples), labels_path)
+    return samples
+
+
+def _percentile(values: List[float], percent: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * percent / 100), len(ordered) - 1)]
+
+
+def _tokens(text: str) -> List[str]:
+    """Normalized whole tokens of a text"""
+    return [token for token in map(normalize_part, text.split()) if token]
+
+
+def run_profile(profile: str, samples: List[Dict], engine: OCREngine) -> Dict:
+    """Preprocess and OCR every sample with one profile"""
+    processor = ImageProcessor(profile)
+    preprocess_times, ocr_times, similarities = [], [], []
+    exact = 0
+    
+    for sample in samples:
+        start = time.perf_counter()
+        processor.prepare(sample['image_path']).materialize()
+        preprocess_times.append(time.perf_counter() - start)
+        
+        start = time.perf_counter()
+        result = engine.extract_from_image(sample['image_path'], profile=profile)
+        ocr_times.append(time.perf_counter() - start)
+        
+        expected, extracted = _tokens(sample['expected_text']), _tokens(result['text'])
+        exact += bool(expected) and set(expected) <= set(extracted)
+        similarities.append(fuzz.ratio(''.join(expected), ''.join(extracted)))
+    
+    return {
+        'profile': profile,
+        'settings': ImageProcessor.PROFILES[profile],
+        'images': len(samples),
+        'preprocess_mean': statistics.mean(preprocess_times),
+        'total_mean': statistics.mean(ocr_times),
+        'total_p50': statistics.median(ocr_times),
+        'total_p95': _percentile(ocr_times, 95),
+        'exact_match_rate': exact / len(samples),
+        'mean_similarity': statistics.mean(similarities)
+    }
+
+
+def compare_profiles(samples: List[Dict], profiles: Optional[List[str]] = None) -> List[Dict]:
+    """
+    Benchmark each preprocessing profile on the same labeled samples
+    total_* timings cover the whole OCR pipeline (preprocessing included), in seconds.
+    Each profile gets a fresh OCREngine, so variant orders learned by the early-exit
+    scheduler on one profile don't speed up the next.
+    """
+    report = []
+    for profile in profiles or list(ImageProcessor.PROFILES):
+        engine = OCREngine()
+        try:
+            report.append(run_profile(profile, samples, engine))
+        finally:
+            engine.shutdown()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare preprocessing profiles on labeled images")
+    parser.add_argument('labels', help="CSV file with image_path and expected_text columns")
+    parser.add_argument('--profiles', nargs='+', choices=list(ImageProcessor.PROFILES),
+                        help="Profiles to compare (default: all)")
+    parser.add_argument('--output', help="Write the report as JSON to this file")
+    args = parser.parse_args()
+    
+    samples = load_labels(args.labels)
+    if not samples:
+        print("No labeled images")
+        return 1
+    
+    report = compare_profiles(samples, args.profiles)
+    
+    print(f"\n{'Profile':<10} {'Prep (ms)':>10} {'Total (ms)':>11} {'p95 (ms)':>9} {'Exact':>7} {'Similarity':>11}")
+    for row in report:
+        print(f"{row['profile']:<10} {row['preprocess_mean'] * 1000:>10.1f} {row['total_mean'] * 1000:>11.1f} "
+              f"{row['total_p95'] * 1000:>9.1f} {row['exact_match_rate']:>7.1%} {row['mean_similarity']:>10.1f}%")
+    
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,288 @@
+"""
+Benchmark the inspection pipeline on synthetic IC images
+
+Usage:
+    python -m benchmarks.run [--count 24] [--seed 0] [--concurrency 1 2 4] [--profile fast]
+                             [--output benchmark.json] [--images DIR] [--verbose]
+
+Runs fully offline: the datasheet scraper is replaced by a stub and inspections
+are written to a temporary SQLite database. Reports per-stage latency, end-to-end
+throughput at each concurrency level, peak memory and OCR accuracy as JSON, so
+runs can be compared.
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+import cv2
+
+from database import DatabaseManager
+from ocr import ImageProcessor, OCREngine, VariantGraph
+from scraper import DatasheetScraper, ReferenceCache
+from utils import setup_logger
+from verification import MarkingVerifier
+from verification.part_index import normalize_part
+from .synthetic import generate_dataset, RESOLUTIONS
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+logger = setup_logger(__name__)
+
+
+class OfflineScraper(DatasheetScraper):
+    """Scraper stub that never touches the network"""
+    
+    def search_datasheet(self, part_number: str, oem_name: str) -> Optional[str]:
+        return f"https://datasheets.invalid/{part_number}.pdf"
+
+
+def summarize(values: List[float]) -> Dict:
+    """Mean, median, p95 and max of durations, in milliseconds"""
+    ordered = sorted(values)
+    return {
+        'count': len(ordered),
+        'mean_ms': statistics.mean(ordered) * 1000,
+        'p50_ms': statistics.median(ordered) * 1000,
+        'p95_ms': ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)] * 1000,
+        'max_ms': ordered[-1] * 1000
+    }
+
+
+class BenchmarkPipeline:
+    """The inspection workflow of ICInspectionAgent, built from its components without the LLM"""
+    
+    def __init__(self, db_manager: DatabaseManager, profile: Optional[str] = None):
+        self.profile = profile
+        self.processor = ImageProcessor(profile)
+        # Concurrency comes from the benchmark's own threads
+        self.ocr_engine = OCREngine(parallel=False)
+        self.reference_cache = ReferenceCache(OfflineScraper(), db_manager)
+        self.verifier = MarkingVerifier()
+        self.db_manager = db_manager
+        self.timings = defaultdict(list)
+        self._lock = threading.Lock()
+    
+    def _timed(self, stage: str, fn: Callable, *args):
+        start = time.perf_counter()
+        result = fn(*args)
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.timings[stage].append(elapsed)
+        return result
+    
+    def _record(self, sample: Dict, ocr_result: Dict, reference: Dict, verification: Dict) -> Dict:
+        return {
+            'image_path': sample['image_path'],
+            'part_number': sample['part_number'],
+            'oem_name': sample['oem_name'],
+            'extracted_text': ocr_result['text'],
+            'ocr_confidence': ocr_result['confidence'],
+            'status': verification['status'],
+            'confidence': verification['confidence'],
+            'differences': verification['differences'],
+            'difference_details': verification['difference_details'],
+            'reference_markings': reference,
+            'datasheet_url': reference.get('datasheet_url')
+        }
+    
+    def inspect_instrumented(self, sample: Dict) -> Dict:
+        """
+        Run every stage once, timing each: load, resize, detect, each preprocessing
+        step, OCR of each variant, reference lookup, verify and database write
+        All variants are OCR'd (no early exit) so every stage gets a timing.
+        """
+        image = self._timed('load', self.processor.load, sample['image_path'])
+        image = self._timed('resize', self.processor.resize_image, image)
+        region = self._timed('detect', self.processor.detect_ic_region, image)
+        if region:
+            image = self.processor.crop_to_region(image, region)
+        
+        variants = VariantGraph(self.processor, image)
+        # steps are listed in dependency order, so each one times only its own work
+        for name in variants.steps:
+            self._timed(f'preprocess.{name}', variants.get, name)
+        
+        results = {
+            name: self._timed(f'ocr.{name}', self.ocr_engine.extract_text, variants.get(name), variants.psm)
+            for name in variants.variant_names
+        }
+        best_variant = max(results, key=lambda name: results[name]['confidence'])
+        best = results[best_variant]
+        
+        reference = self._timed('reference', self.reference_cache.get, sample['part_number'], sample['oem_name'])
+        verification = self._timed('verify', self.verifier.verify_marking, best['text'], reference,
+                                   None, best.get('words'))
+        self._timed('db_write', self.db_manager.insert_inspections,
+                    [self._record(sample, best, reference, verification)])
+        
+        return {'variant': best_variant, 'ocr': best, 'verification': verification}
+    
+    def inspect(self, sample: Dict) -> Dict:
+        """The production path: lazy variants with early exit, then verify and queue the write"""
+        ocr_result = self.ocr_engine.extract_from_image(
+            sample['image_path'], sample['part_number'], sample['oem_name'], self.profile
+        )
+        reference = self.reference_cache.get(sample['part_number'], sample['oem_name'])
+        verification = self.verifier.verify_marking(ocr_result['text'], reference, None, ocr_result.get('words'))
+        self.db_manager.writer.submit(self._record(sample, ocr_result, reference, verification))
+        return verification
+
+
+def score_accuracy(samples: List[Dict], outcomes: List[Dict]) -> Dict:
+    """OCR and verification accuracy against ground truth, overall and per resolution"""
+    def rates(pairs):
+        part_found = date_found = genuine = 0
+        for sample, outcome in pairs:
+            text = normalize_part(outcome['ocr']['text'])
+            part_found += normalize_part(sample['part_number']) in text
+            date_found += sample['date_code'] in text
+            genuine += outcome['verification']['status'] == 'GENUINE'
+        return {
+            'images': len(pairs),
+            'part_number_read_rate': part_found / len(pairs),
+            'date_code_read_rate': date_found / len(pairs),
+            'genuine_rate': genuine / len(pairs)
+        }
+    
+    pairs = list(zip(samples, outcomes))
+    by_resolution = defaultdict(list)
+    for sample, outcome in pairs:
+        by_resolution[f"{sample['width']}x{sample['height']}"].append((sample, outcome))
+    
+    accuracy = rates(pairs)
+    accuracy['by_resolution'] = {resolution: rates(group) for resolution, group in by_resolution.items()}
+    return accuracy
+
+
+def measure_throughput(pipeline: BenchmarkPipeline, samples: List[Dict], concurrency: int) -> Dict:
+    """Inspect every sample with concurrency worker threads"""
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='bench') as pool:
+        list(pool.map(pipeline.inspect, samples))
+    pipeline.db_manager.writer.flush()
+    elapsed = time.perf_counter() - start
+    return {
+        'concurrency': concurrency,
+        'images': len(samples),
+        'seconds': elapsed,
+        'images_per_second': len(samples) / elapsed
+    }
+
+
+def measure_peak_memory(pipeline: BenchmarkPipeline, samples: List[Dict]) -> float:
+    """
+    Peak traced allocation in MB over one more pass of every sample
+    Run apart from the timed pass since tracing slows every allocation; the
+    stage timings it records are discarded.
+    """
+    timings = pipeline.timings
+    pipeline.timings = defaultdict(list)
+    tracemalloc.start()
+    try:
+        for sample in samples:
+            pipeline.inspect_instrumented(sample)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        pipeline.timings = timings
+    return peak / 2 ** 20
+
+
+def run_benchmark(samples: List[Dict], database_url: str, concurrency_levels: List[int],
+                  profile: Optional[str] = None) -> Dict:
+    """Run the stage, memory, accuracy and throughput measurements on prepared samples"""
+    db_manager = DatabaseManager(database_url)
+    pipeline = BenchmarkPipeline(db_manager, profile)
+    
+    outcomes = [pipeline.inspect_instrumented(sample) for sample in samples]
+    stages = {stage: summarize(values) for stage, values in pipeline.timings.items()}
+    peak_mb = measure_peak_memory(pipeline, samples)
+    throughput = [measure_throughput(pipeline, samples, level) for level in concurrency_levels]
+    db_manager.close()
+    
+    memory = {'tracemalloc_peak_mb': peak_mb}
+    if resource is not None:
+        # ru_maxrss is in kilobytes on Linux and bytes on macOS
+        divisor = 2 ** 20 if sys.platform == 'darwin' else 2 ** 10
+        memory['max_rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / divisor
+    
+    return {
+        'meta': {
+            'timestamp': datetime.utcnow().isoformat(),
+            'python': platform.python_version(),
+            'opencv': cv2.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'ocr_backend': pipeline.ocr_engine.backend.name,
+            'profile': pipeline.processor.profile,
+            'ocr_config_version': pipeline.ocr_engine.version_for(profile),
+            'images': len(samples)
+        },
+        'stages': stages,
+        'throughput': throughput,
+        'memory': memory,
+        'accuracy': score_accuracy(samples, outcomes)
+    }
+
+
+def _quiet_logs():
+    """Keep per-image INFO logs out of the benchmark output and timings"""
+    for named_logger in logging.Logger.manager.loggerDict.values():
+        if isinstance(named_logger, logging.Logger):
+            named_logger.setLevel(logging.WARNING)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the IC inspection pipeline offline")
+    parser.add_argument('--count', type=int, default=24, help="Number of synthetic images")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed for image generation")
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 2, 4],
+                        help="Worker thread counts for the throughput runs")
+    parser.add_argument('--profile', choices=list(ImageProcessor.PROFILES), default=None,
+                        help="Preprocessing profile (defaults to PREPROCESSING_PROFILE)")
+    parser.add_argument('--images', help="Keep the generated images in this directory")
+    parser.add_argument('--output', help="Write the JSON report to this file (default: stdout)")
+    parser.add_argument('--verbose', action='store_true', help="Keep INFO logging")
+    args = parser.parse_args()
+    
+    if not args.verbose:
+        _quiet_logs()
+    
+    with tempfile.TemporaryDirectory(prefix='ic-bench-') as workdir:
+        samples = generate_dataset(args.images or os.path.join(workdir, 'images'), args.count, args.seed)
+        database_url = f"sqlite:///{os.path.join(workdir, 'benchmark.db')}"
+        report = run_benchmark(samples, database_url, args.concurrency, args.profile)
+    report['meta'].update(seed=args.seed, resolutions=[f"{w}x{h}" for w, h in RESOLUTIONS])
+    
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Benchmark report written to {args.output}")
+        for stage, stats in sorted(report['stages'].items()):
+            print(f"  {stage:<32} {stats['mean_ms']:>9.1f} ms  (p95 {stats['p95_ms']:.1f} ms)")
+        for run in report['throughput']:
+            print(f"  concurrency {run['concurrency']:<3} {run['images_per_second']:>8.2f} images/s")
+        print(f"  part number read rate: {report['accuracy']['part_number_read_rate']:.1%}")
+    else:
+        print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
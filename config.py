@@ -11,33 +11,102 @@ class Config:
     
     # Database
     DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./ic_inspection.db")
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))  # pooled connections kept open
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))  # extra connections under load
+    DB_POOL_TIMEOUT = 30  # seconds to wait for a free connection
+    DB_POOL_RECYCLE = 1800  # seconds before a server connection is replaced
+    SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+    SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+    SQLITE_BUSY_TIMEOUT_MS = 5000  # how long a writer waits for the write lock
+    SQLITE_CACHE_SIZE_KB = 64 * 1024  # page cache per connection
+    SQLITE_MMAP_SIZE = 256 * 1024 * 1024  # bytes of the file read through mmap
+    DB_WRITE_BATCH_SIZE = int(os.getenv("DB_WRITE_BATCH_SIZE", "100"))  # records per group commit
+    DB_WRITE_INTERVAL = float(os.getenv("DB_WRITE_INTERVAL", "0.05"))  # longest wait before a flush, seconds
+    DB_WRITE_MAX_PENDING = 10000  # buffered records before submitters block
+    HISTORY_PAGE_SIZE = 50  # inspections per history page
+    HISTORY_MAX_PAGE_SIZE = 500
+    STATS_CONFIDENCE_BINS = 20  # histogram bins over [0, 1]; changing it needs --rebuild-rollups
+    STATION_ID = os.getenv("STATION_ID", "")  # station recorded when a request doesn't name one
     
     # Tesseract OCR
     TESSERACT_CMD = os.getenv("TESSERACT_CMD", r"C:\Program Files\Tesseract-OCR\tesseract.exe")
+    OCR_BACKEND = os.getenv("OCR_BACKEND", "auto")  # auto, tesserocr or pytesseract
+    OCR_LANGUAGE = os.getenv("OCR_LANGUAGE", "eng")
+    TESSDATA_PATH = os.getenv("TESSDATA_PATH", "")  # tessdata directory for tesserocr
     
     # Image Processing
     IMAGE_MAX_WIDTH = 1920
     IMAGE_MAX_HEIGHT = 1080
     OCR_CONFIDENCE_THRESHOLD = 60.0
+    OCR_TEXT_LOCALIZATION = os.getenv("OCR_TEXT_LOCALIZATION", "false").lower() == "true"
+    OCR_LOCALIZED_PSM = 6  # Tesseract page segmentation mode for stacked text lines
+    PREPROCESSING_PROFILE = os.getenv("PREPROCESSING_PROFILE", "accurate")  # fast, balanced or accurate
+    
+    # OCR Execution
+    OCR_PARALLEL = os.getenv("OCR_PARALLEL", "true").lower() == "true"
+    OCR_POOL_TYPE = os.getenv("OCR_POOL_TYPE", "thread")  # thread or process
+    OCR_MAX_WORKERS = int(os.getenv("OCR_MAX_WORKERS", "5"))
+    OCR_EARLY_EXIT = os.getenv("OCR_EARLY_EXIT", "true").lower() == "true"
+    OCR_EARLY_EXIT_CONFIDENCE = 90.0
+    OCR_FIRST_WAVE_SIZE = 1  # variants tried before fanning out to the pool
+    OCR_RESULT_CACHE = os.getenv("OCR_RESULT_CACHE", "true").lower() == "true"
+    
+    # Batch Inspection
+    BATCH_MAX_WORKERS = int(os.getenv("BATCH_MAX_WORKERS", str(os.cpu_count() or 1)))
+    
+    # Tray Inspection (several ICs in one frame)
+    TRAY_MIN_REGION_AREA = 0.002  # fraction of the frame
+    TRAY_MAX_REGION_AREA = 0.5
+    TRAY_MAX_ASPECT = 4.0  # long side / short side
+    TRAY_MAX_REGIONS = int(os.getenv("TRAY_MAX_REGIONS", "64"))
     
     # Web Scraping
     SCRAPER_TIMEOUT = 30
+    SCRAPER_SEARCH_URL = os.getenv("SCRAPER_SEARCH_URL", "https://www.google.com/search")
+    SCRAPER_POOL_SIZE = int(os.getenv("SCRAPER_POOL_SIZE", "10"))  # keep-alive connections per host
+    SCRAPER_RATE_LIMIT = float(os.getenv("SCRAPER_RATE_LIMIT", "2"))  # requests per second per host, 0 = off
+    SCRAPER_MAX_CONCURRENCY = int(os.getenv("SCRAPER_MAX_CONCURRENCY", "8"))  # parallel lookups for a lot
     MAX_RETRIES = 3
+    RETRY_BACKOFF_BASE = 0.5  # seconds; doubles on every retry, with full jitter
+    RETRY_BACKOFF_MAX = 10.0
     USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
     
+    # Reference Cache
+    REFERENCE_CACHE_SIZE = 1024  # parts kept in memory
+    REFERENCE_CACHE_TTL = 3600  # seconds
+    REFERENCE_NEGATIVE_TTL = 300  # seconds to remember a failed lookup
+    REFERENCE_CACHE_MAX_AGE_DAYS = 30
+    
     # Verification
     SIMILARITY_THRESHOLD = 0.85
     FUZZY_MATCH_THRESHOLD = 80
+    PART_CANDIDATES = 5  # known parts suggested per inspection
+    PART_ID_MIN_SCORE = 70  # minimum score to auto-fill a missing part number
+    RELABEL_MARGIN = 10  # points another part must beat the claimed one by
     
     # Logging
     LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
     LOG_FILE = "ic_inspection.log"
+    LOG_QUEUE = os.getenv("LOG_QUEUE", "true").lower() == "true"  # write logs from a background thread
+    LOG_FORMAT = os.getenv("LOG_FORMAT", "text")  # text or json (log file only)
+    LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+    LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
     
     # Storage
     UPLOAD_FOLDER = "uploads"
     RESULTS_FOLDER = "results"
     DATASHEET_CACHE = "datasheet_cache"
     
+    # Web API
+    API_MAX_CONCURRENT_INSPECTIONS = int(os.getenv("API_MAX_CONCURRENT_INSPECTIONS", "4"))
+    API_MAX_QUEUED_INSPECTIONS = int(os.getenv("API_MAX_QUEUED_INSPECTIONS", "16"))
+    API_RETRY_AFTER = 5  # seconds suggested to clients when the server is saturated
+    API_INSPECT_MODE = os.getenv("API_INSPECT_MODE", "sync")  # sync or async (job queue)
+    API_JOB_WORKERS = int(os.getenv("API_JOB_WORKERS", "4"))
+    API_JOB_MAX_PENDING = int(os.getenv("API_JOB_MAX_PENDING", "1000"))
+    API_JOB_RESULT_TTL = 3600  # seconds finished job results are kept
+    API_JOB_MAX_WAIT = 60  # longest long-poll wait in seconds
+    
     # AI Agent
     LLM_MODEL = "gemini-pro"
     LLM_TEMPERATURE = 0.1
@@ -1,4 +1,12 @@
-from .models import Base, InspectionRecord, DatasheetCache
+from .engine import create_db_engine
+from .models import (
+    Base, InspectionRecord, InspectionDifference, InspectionRollup, DatasheetCache, OCRResultCache
+)
 from .storage import DatabaseManager
+from .writer import BufferedInspectionWriter
 
-__all__ = ['Base', 'InspectionRecord', 'DatasheetCache', 'DatabaseManager']
+__all__ = [
+    'Base', 'InspectionRecord', 'InspectionDifference', 'InspectionRollup', 'DatasheetCache',
+    'OCRResultCache',
+    'DatabaseManager', 'BufferedInspectionWriter', 'create_db_engine'
+]
@@ -0,0 +1,71 @@
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.pool import StaticPool
+
+from config import Config
+from utils import setup_logger
+
+logger = setup_logger(__name__)
+
+
+def _sqlite_pragmas() -> dict:
+    """Per-connection SQLite settings for concurrent readers and writers"""
+    return {
+        'journal_mode': Config.SQLITE_JOURNAL_MODE,  # WAL: readers never wait for the writer
+        'synchronous': Config.SQLITE_SYNCHRONOUS,  # NORMAL is durable in WAL mode except on power loss
+        'busy_timeout': Config.SQLITE_BUSY_TIMEOUT_MS,
+        'cache_size': -Config.SQLITE_CACHE_SIZE_KB,  # negative = KiB rather than pages
+        'mmap_size': Config.SQLITE_MMAP_SIZE,
+        'temp_store': 'MEMORY'
+    }
+
+
+def create_db_engine(database_url: str) -> Engine:
+    """
+    Create the SQLAlchemy engine for a database URL
+    File-backed SQLite gets WAL mode and the pragmas above on every pooled
+    connection, shared across threads; in-memory SQLite shares one connection.
+    Server databases get a sized pool that checks connections before use.
+    """
+    url = make_url(database_url)
+    
+    if url.get_backend_name() != 'sqlite':
+        return create_engine(
+            url,
+            pool_size=Config.DB_POOL_SIZE,
+            max_overflow=Config.DB_MAX_OVERFLOW,
+            pool_timeout=Config.DB_POOL_TIMEOUT,
+            pool_recycle=Config.DB_POOL_RECYCLE,
+            pool_pre_ping=True
+        )
+    
+    connect_args = {
+        'check_same_thread': False,  # connections move between request and writer threads
+        'timeout': Config.SQLITE_BUSY_TIMEOUT_MS / 1000
+    }
+    if url.database in (None, '', ':memory:'):
+        # Every connection to :memory: would be a separate empty database
+        return create_engine(url, connect_args=connect_args, poolclass=StaticPool)
+    
+    engine = create_engine(
+        url,
+        connect_args=connect_args,
+        pool_size=Config.DB_POOL_SIZE,
+        max_overflow=Config.DB_MAX_OVERFLOW,
+        pool_timeout=Config.DB_POOL_TIMEOUT
+    )
+    pragmas = _sqlite_pragmas()
+    
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+    
+    with engine.connect() as connection:
+        journal_mode = connection.exec_driver_sql("PRAGMA journal_mode").scalar()
+    logger.info("SQLite journal mode: %s", journal_mode)
+    return engine
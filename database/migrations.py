@@ -0,0 +1,183 @@
+"""
+Bring an existing database up to the current schema
+
+Usage:
+    python -m database.migrations [--database-url URL] [--batch-size 1000] [--dry-run] [--vacuum]
+                                  [--rebuild-rollups]
+
+Adds columns introduced after a table was created (also done on every start by
+DatabaseManager), then backfills old inspection records: their JSON list of
+differences becomes InspectionDifference rows, and a reference_markings copy
+of a cached reference becomes a datasheet_id / reference_version link. Work is
+committed in batches, so the tool can be interrupted and run again. Statistics
+rollups are computed from the records when the rollup table is still empty,
+or always with --rebuild-rollups.
+"""
+
+import argparse
+import json
+import sys
+
+from sqlalchemy import bindparam, func, inspect, insert, select, update
+from sqlalchemy.engine import Engine
+
+from config import Config
+from utils import setup_logger
+from .engine import create_db_engine
+from .models import Base, DatasheetCache, InspectionDifference, InspectionRecord, InspectionRollup
+from .schema import add_missing_columns, classify_difference
+from .storage import DatabaseManager
+
+logger = setup_logger(__name__)
+
+
+def migrate_differences(engine: Engine, batch_size: int = 1000, dry_run: bool = False) -> int:
+    """Move JSON differences of old records into InspectionDifference rows; returns records migrated"""
+    migrated, last_id = 0, 0
+    while True:
+        with engine.begin() as connection:
+            rows = connection.execute(
+                select(InspectionRecord.id, InspectionRecord.differences)
+                .where(InspectionRecord.differences.isnot(None), InspectionRecord.id > last_id)
+                .order_by(InspectionRecord.id).limit(batch_size)
+            ).all()
+            if not rows:
+                return migrated
+            last_id = rows[-1].id
+            
+            children = []
+            for record_id, differences in rows:
+                try:
+                    messages = json.loads(differences) or []
+                except ValueError:
+                    messages = [differences]
+                for message in messages:
+                    field, code = classify_difference(str(message))
+                    children.append({'inspection_id': record_id, 'field': field, 'code': code,
+                                     'message': str(message)})
+            migrated += len(rows)
+            if dry_run:
+                continue
+            
+            if children:
+                connection.execute(insert(InspectionDifference), children)
+            connection.execute(
+                update(InspectionRecord)
+                .where(InspectionRecord.id.in_([row.id for row in rows]))
+                .values(differences=None)
+            )
+        logger.info("Migrated differences of %s records", migrated)
+
+
+def link_references(engine: Engine, batch_size: int = 1000, dry_run: bool = False) -> int:
+    """
+    Replace reference_markings copies of a cached reference with a link to it
+    A copy is linked when the cache holds the same part with the same datasheet
+    URL; others (e.g. fallback references of failed lookups) are kept as they are.
+    
+    Returns:
+        Records linked
+    """
+    with engine.connect() as connection:
+        cache = {
+            row.part_number: row
+            for row in connection.execute(
+                select(DatasheetCache.part_number, DatasheetCache.id, DatasheetCache.version,
+                       DatasheetCache.datasheet_url)
+            )
+        }
+    
+    linked, last_id = 0, 0
+    while True:
+        with engine.begin() as connection:
+            rows = connection.execute(
+                select(InspectionRecord.id, InspectionRecord.part_number, InspectionRecord.reference_markings)
+                .where(InspectionRecord.reference_markings.isnot(None),
+                       InspectionRecord.datasheet_id.is_(None),
+                       InspectionRecord.id > last_id)
+                .order_by(InspectionRecord.id).limit(batch_size)
+            ).all()
+            if not rows:
+                return linked
+            last_id = rows[-1].id
+            
+            links = []
+            for record_id, part_number, reference_markings in rows:
+                try:
+                    datasheet_url = (json.loads(reference_markings) or {}).get('datasheet_url')
+                except (ValueError, AttributeError):
+                    continue
+                cached = cache.get(part_number.strip().upper())
+                if datasheet_url and cached is not None and cached.datasheet_url == datasheet_url:
+                    links.append({'record_id': record_id, 'link_id': cached.id, 'link_version': cached.version})
+            linked += len(links)
+            if dry_run or not links:
+                continue
+            
+            table = InspectionRecord.__table__
+            connection.execute(
+                table.update().where(table.c.id == bindparam('record_id')).values(
+                    datasheet_id=bindparam('link_id'),
+                    reference_version=bindparam('link_version'),
+                    reference_markings=None
+                ),
+                links
+            )
+        logger.info("Linked %s records to cached references", linked)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate an IC inspection database to the current schema")
+    parser.add_argument('--database-url', default=Config.DATABASE_URL, help="Defaults to DATABASE_URL")
+    parser.add_argument('--batch-size', type=int, default=1000, help="Records per transaction")
+    parser.add_argument('--dry-run', action='store_true', help="Only report what would change")
+    parser.add_argument('--vacuum', action='store_true', help="Reclaim freed space afterwards (SQLite)")
+    parser.add_argument('--rebuild-rollups', action='store_true',
+                        help="Recompute statistics rollups even if the table is filled")
+    args = parser.parse_args()
+    
+    engine = create_db_engine(args.database_url)
+    if args.dry_run:
+        inspector = inspect(engine)
+        missing = [
+            f"{table.name}.{column.name}"
+            for table in Base.metadata.sorted_tables if inspector.has_table(table.name)
+            for column in table.columns
+            if column.name not in {c['name'] for c in inspector.get_columns(table.name)}
+        ]
+        print(f"Columns to add: {', '.join(missing) or 'none'}")
+        if missing:
+            print("Run without --dry-run to add them before the data can be inspected")
+            return 0
+    else:
+        add_missing_columns(engine)
+        Base.metadata.create_all(bind=engine)
+    
+    differences = migrate_differences(engine, args.batch_size, args.dry_run)
+    references = link_references(engine, args.batch_size, args.dry_run)
+    verb = "Would migrate" if args.dry_run else "Migrated"
+    print(f"{verb} differences of {differences} records")
+    print(f"{verb} {references} reference copies to cache links")
+    
+    rollups = 0
+    if inspect(engine).has_table(InspectionRollup.__tablename__):
+        with engine.connect() as connection:
+            rollups = connection.execute(select(func.count()).select_from(InspectionRollup)).scalar()
+    if args.rebuild_rollups or not rollups:
+        if args.dry_run:
+            print("Would rebuild statistics rollups")
+        else:
+            db_manager = DatabaseManager(args.database_url)
+            counted = db_manager.rebuild_rollups(batch_size=args.batch_size)
+            db_manager.close()
+            print(f"Rebuilt statistics rollups from {counted} records")
+    
+    if args.vacuum and not args.dry_run and engine.dialect.name == 'sqlite':
+        with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+            connection.exec_driver_sql("VACUUM")
+        print("Vacuumed database")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
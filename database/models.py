@@ -1,4 +1,6 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Text, Boolean
+from sqlalchemy import (
+    Column, Integer, String, Float, Date, DateTime, Text, Boolean, ForeignKey, Index, UniqueConstraint
+)
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
 
@@ -7,6 +9,12 @@ Base = declarative_base()
 class InspectionRecord(Base):
     """Database model for IC inspection records"""
     __tablename__ = 'inspection_records'
+    __table_args__ = (
+        # History queries filter on part or status and page newest first
+        Index('ix_inspection_records_part_timestamp', 'part_number', 'timestamp'),
+        Index('ix_inspection_records_status_timestamp', 'status', 'timestamp'),
+        Index('ix_inspection_records_timestamp', 'timestamp'),
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True)
     timestamp = Column(DateTime, default=datetime.utcnow, nullable=False)
@@ -21,13 +29,16 @@ class InspectionRecord(Base):
     # Verification Results
     status = Column(String(50), nullable=False)  # GENUINE, FAKE, UNCERTAIN
     confidence = Column(Float, nullable=False)
-    differences = Column(Text, nullable=True)  # JSON string of differences
+    differences = Column(Text, nullable=True)  # legacy JSON list; now stored as InspectionDifference rows
     
-    # Reference Data
+    # Reference Data: a link to the cached reference, or a JSON copy when it isn't cached
+    datasheet_id = Column(Integer, ForeignKey('datasheet_cache.id'), nullable=True, index=True)
+    reference_version = Column(Integer, nullable=True)  # DatasheetCache.version verified against
     reference_markings = Column(Text, nullable=True)  # JSON string
     datasheet_url = Column(String(500), nullable=True)
     
     # Additional metadata
+    station_id = Column(String(100), nullable=True)  # inspection station that took the photo
     notes = Column(Text, nullable=True)
     verified_by = Column(String(100), nullable=True)
     
@@ -35,6 +46,52 @@ class InspectionRecord(Base):
         return f"<InspectionRecord(id={self.id}, part_number={self.part_number}, status={self.status})>"
 
 
+class InspectionDifference(Base):
+    """One way an inspected marking differs from its reference"""
+    __tablename__ = 'inspection_differences'
+    __table_args__ = (
+        # "All inspections failing on <field/code>" queries
+        Index('ix_inspection_differences_code', 'code', 'inspection_id'),
+        Index('ix_inspection_differences_field', 'field', 'inspection_id'),
+    )
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    inspection_id = Column(Integer, ForeignKey('inspection_records.id'), nullable=False, index=True)
+    field = Column(String(30), nullable=True)  # part, patterns, date_code
+    code = Column(String(50), nullable=False)  # e.g. part_mismatch, date_code_invalid
+    message = Column(Text, nullable=False)
+    
+    def __repr__(self):
+        return f"<InspectionDifference(inspection_id={self.inspection_id}, code={self.code})>"
+
+
+class InspectionRollup(Base):
+    """
+    Inspection counts per day, part, OEM, station, status and confidence bin
+    Kept up to date in the transaction that saves the inspections, so
+    statistics never scan inspection_records.
+    """
+    __tablename__ = 'inspection_rollups'
+    __table_args__ = (
+        UniqueConstraint('day', 'part_number', 'oem_name', 'station_id', 'status', 'confidence_bin',
+                         name='uq_inspection_rollups_bucket'),
+        Index('ix_inspection_rollups_part_day', 'part_number', 'day'),
+    )
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    day = Column(Date, nullable=False)  # UTC
+    part_number = Column(String(100), nullable=False)
+    oem_name = Column(String(100), nullable=False)
+    station_id = Column(String(100), nullable=False, default='')  # '' when unknown, so buckets stay unique
+    status = Column(String(50), nullable=False)
+    confidence_bin = Column(Integer, nullable=False)  # floor(confidence * Config.STATS_CONFIDENCE_BINS)
+    count = Column(Integer, nullable=False, default=0)
+    confidence_sum = Column(Float, nullable=False, default=0.0)
+    
+    def __repr__(self):
+        return f"<InspectionRollup(day={self.day}, part_number={self.part_number}, status={self.status})>"
+
+
 class DatasheetCache(Base):
     """Cache for downloaded datasheet information"""
     __tablename__ = 'datasheet_cache'
@@ -46,6 +103,27 @@ class DatasheetCache(Base):
     marking_info = Column(Text, nullable=True)  # JSON string
     last_updated = Column(DateTime, default=datetime.utcnow, nullable=False)
     is_valid = Column(Boolean, default=True)
+    version = Column(Integer, default=1, server_default='1', nullable=False)  # bumped when the reference changes
     
     def __repr__(self):
         return f"<DatasheetCache(part_number={self.part_number}, oem={self.oem_name})>"
+
+
+class OCRResultCache(Base):
+    """Memoized OCR results keyed by image content hash and OCR configuration"""
+    __tablename__ = 'ocr_result_cache'
+    __table_args__ = (
+        UniqueConstraint('image_hash', 'config_version', name='uq_ocr_result_cache_key'),
+    )
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    image_hash = Column(String(64), nullable=False)  # SHA-256 of the uploaded file
+    config_version = Column(String(40), nullable=False)  # OCREngine.config_version
+    extracted_text = Column(Text, nullable=True)
+    ocr_confidence = Column(Float, nullable=True)
+    variant = Column(String(50), nullable=True)
+    words = Column(Text, nullable=True)  # JSON list of word boxes with their block/paragraph/line
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    
+    def __repr__(self):
+        return f"<OCRResultCache(image_hash={self.image_hash[:12]}, config={self.config_version[:8]})>"
@@ -0,0 +1,58 @@
+import re
+from typing import List, Optional, Tuple
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+
+from utils import setup_logger
+from .models import Base
+
+logger = setup_logger(__name__)
+
+# Messages of the verifier, for records saved before differences were structured
+DIFFERENCE_PATTERNS = [
+    (re.compile(r'^Part number mismatch'), 'part', 'part_mismatch'),
+    (re.compile(r'^Expected marking patterns not found'), 'patterns', 'patterns_missing'),
+    (re.compile(r'^Invalid date code'), 'date_code', 'date_code_invalid'),
+    (re.compile(r'^Date code not found'), 'date_code', 'date_code_missing'),
+    (re.compile(r'^Marking matches .+ better than'), 'part', 'relabel_suspect'),
+]
+
+
+def classify_difference(message: str) -> Tuple[Optional[str], str]:
+    """(field, code) of a difference message; unknown messages get code 'other'"""
+    for pattern, field, code in DIFFERENCE_PATTERNS:
+        if pattern.match(message):
+            return field, code
+    return None, 'other'
+
+
+def add_missing_columns(engine: Engine) -> List[str]:
+    """
+    ALTER TABLE ADD COLUMN for model columns missing from existing tables
+    New columns must be nullable or have a server default.
+    
+    Returns:
+        "table.column" names that were added
+    """
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    added = []
+    with engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(engine.dialect)}"
+                if column.server_default is not None:
+                    ddl += f" DEFAULT {column.server_default.arg}"
+                    if not column.nullable:
+                        ddl += " NOT NULL"
+                connection.execute(text(ddl))
+                added.append(f"{table.name}.{column.name}")
+    if added:
+        logger.info("Added columns: %s", ', '.join(added))
+    return added
@@ -1,65 +1,304 @@
-from sqlalchemy import create_engine
+from sqlalchemy import and_, case, delete, func, insert, or_, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import sessionmaker, Session
-from typing import Optional, List, Dict
-from datetime import datetime, timedelta
+from typing import Iterable, Optional, List, Dict, Sequence, Tuple
+from datetime import date, datetime, timedelta
+import base64
 import json
 
 from config import Config
-from .models import Base, InspectionRecord, DatasheetCache
-from utils import setup_logger
+from .engine import create_db_engine
+from .models import (
+    Base, InspectionRecord, InspectionDifference, InspectionRollup, DatasheetCache, OCRResultCache
+)
+from .schema import add_missing_columns, classify_difference
+from .writer import BufferedInspectionWriter
+from utils import setup_logger, timed
 
 logger = setup_logger(__name__)
 
+# Columns returned by history listings; the large JSON columns are never loaded
+HISTORY_COLUMNS = (
+    InspectionRecord.id,
+    InspectionRecord.timestamp,
+    InspectionRecord.part_number,
+    InspectionRecord.oem_name,
+    InspectionRecord.status,
+    InspectionRecord.confidence
+)
+
+
+# Dimensions statistics can be grouped by
+STATS_GROUPS = ('day', 'part_number', 'oem_name', 'station_id')
+ROLLUP_KEY = ('day', 'part_number', 'oem_name', 'station_id', 'status', 'confidence_bin')
+
+
+def confidence_bin(confidence: float) -> int:
+    """Histogram bin of a confidence in [0, 1]"""
+    bins = Config.STATS_CONFIDENCE_BINS
+    return min(max(int(confidence * bins), 0), bins - 1)
+
+
+def rollup_increments(rows: Iterable[Dict]) -> List[Dict]:
+    """Aggregate inspection column values into InspectionRollup increments"""
+    buckets = {}
+    for row in rows:
+        if row.get('status') is None or row.get('confidence') is None:
+            continue
+        key = (row['timestamp'].date(), row['part_number'], row['oem_name'], row.get('station_id') or '',
+               row['status'], confidence_bin(row['confidence']))
+        bucket = buckets.setdefault(key, [0, 0.0])
+        bucket[0] += 1
+        bucket[1] += row['confidence']
+    return [
+        dict(zip(ROLLUP_KEY, key), count=count, confidence_sum=confidence_sum)
+        for key, (count, confidence_sum) in buckets.items()
+    ]
+
+
+def encode_cursor(timestamp: datetime, record_id: int) -> str:
+    """Opaque keyset cursor pointing just past (timestamp, id) in newest-first order"""
+    return base64.urlsafe_b64encode(f"{timestamp.isoformat()}|{record_id}".encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Inverse of encode_cursor; raises ValueError for a malformed cursor"""
+    try:
+        timestamp, record_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return datetime.fromisoformat(timestamp), int(record_id)
+    except Exception:
+        raise ValueError(f"Invalid cursor: {cursor}")
+
 
 class DatabaseManager:
     """Manages database operations for IC inspection system"""
     
     def __init__(self, database_url: Optional[str] = None):
         self.database_url = database_url or Config.DATABASE_URL
-        self.engine = create_engine(self.database_url, echo=False)
+        self.engine = create_db_engine(self.database_url)
         self.SessionLocal = sessionmaker(bind=self.engine)
         self._create_tables()
-        logger.info(f"Database initialized: {self.database_url}")
+        add_missing_columns(self.engine)
+        self._ensure_indexes()
+        # Inspection records are group-committed by a background writer
+        self.writer = BufferedInspectionWriter(self)
+        logger.info("Database initialized: %s", self.database_url)
     
     def _create_tables(self):
         """Create all tables if they don't exist"""
         Base.metadata.create_all(bind=self.engine)
     
+    def _ensure_indexes(self):
+        """Add indexes defined after a table was created; create_all skips existing tables"""
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(bind=self.engine, checkfirst=True)
+    
     def get_session(self) -> Session:
         """Get a new database session"""
         return self.SessionLocal()
     
     # Inspection Record Operations
     
+    @staticmethod
+    def _inspection_values(inspection_data: Dict) -> Dict:
+        """Map inspection data to InspectionRecord column values"""
+        return {
+            'timestamp': inspection_data.get('timestamp') or datetime.utcnow(),
+            'image_path': inspection_data.get('image_path'),
+            'part_number': inspection_data.get('part_number'),
+            'oem_name': inspection_data.get('oem_name'),
+            'extracted_text': inspection_data.get('extracted_text'),
+            'ocr_confidence': inspection_data.get('ocr_confidence'),
+            'status': inspection_data.get('status'),
+            'confidence': inspection_data.get('confidence'),
+            'reference_markings': json.dumps(inspection_data.get('reference_markings', {})),
+            'datasheet_url': inspection_data.get('datasheet_url'),
+            'station_id': inspection_data.get('station_id') or Config.STATION_ID or None,
+            'notes': inspection_data.get('notes')
+        }
+    
+    @staticmethod
+    def _difference_rows(record_id: int, inspection_data: Dict) -> List[Dict]:
+        """InspectionDifference rows from the verifier's difference_details, or from plain messages"""
+        details = inspection_data.get('difference_details')
+        if details is None:
+            details = []
+            for message in inspection_data.get('differences') or []:
+                field, code = classify_difference(message)
+                details.append({'field': field, 'code': code, 'message': message})
+        return [
+            {'inspection_id': record_id, 'field': d.get('field'), 'code': d['code'], 'message': d['message']}
+            for d in details
+        ]
+    
+    @staticmethod
+    def _reference_links(session: Session, inspections: List[Dict]) -> Dict[str, Tuple[int, int]]:
+        """
+        Cached references the inspections were verified against, by part number
+        A reference counts as cached when DatasheetCache holds its part with the
+        same datasheet URL; those are linked instead of copied into each record.
+        
+        Returns:
+            {normalized part number: (DatasheetCache.id, version)}
+        """
+        urls = {}
+        for data in inspections:
+            reference = data.get('reference_markings') or {}
+            if reference.get('datasheet_url') and data.get('part_number'):
+                urls[data['part_number'].strip().upper()] = reference['datasheet_url']
+        if not urls:
+            return {}
+        
+        rows = session.execute(
+            select(DatasheetCache.part_number, DatasheetCache.id, DatasheetCache.version,
+                   DatasheetCache.datasheet_url)
+            .where(DatasheetCache.part_number.in_(list(urls)), DatasheetCache.is_valid == True)
+        )
+        return {
+            row.part_number: (row.id, row.version)
+            for row in rows if row.datasheet_url == urls[row.part_number]
+        }
+    
     def save_inspection(self, inspection_data: Dict) -> InspectionRecord:
-        """Save an inspection record to the database"""
-        session = self.get_session()
-        try:
-            record = InspectionRecord(
-                image_path=inspection_data.get('image_path'),
-                part_number=inspection_data.get('part_number'),
-                oem_name=inspection_data.get('oem_name'),
-                extracted_text=inspection_data.get('extracted_text'),
-                ocr_confidence=inspection_data.get('ocr_confidence'),
-                status=inspection_data.get('status'),
-                confidence=inspection_data.get('confidence'),
-                differences=json.dumps(inspection_data.get('differences', [])),
-                reference_markings=json.dumps(inspection_data.get('reference_markings', {})),
-                datasheet_url=inspection_data.get('datasheet_url'),
-                notes=inspection_data.get('notes')
+        """
+        Save an inspection record to the database
+        The record is committed with whatever else the buffered writer holds; this
+        waits for that commit and returns a detached copy of the saved row.
+        """
+        values = self._inspection_values(inspection_data)
+        record_id = self.writer.write(dict(inspection_data, timestamp=values['timestamp']))
+        logger.info("Saved inspection record: %s", record_id)
+        return InspectionRecord(id=record_id, **values)
+    
+    def save_inspections(self, inspections: List[Dict]) -> int:
+        """Save many inspection records with one bulk insert in a single transaction"""
+        return len(self.insert_inspections(inspections))
+    
+    @timed('db.insert_inspections')
+    def insert_inspections(self, inspections: List[Dict]) -> List[int]:
+        """
+        Insert inspection records with one bulk INSERT ... RETURNING in a single transaction
+        
+        Returns:
+            The new record ids, in the order of inspections
+        """
+        if not inspections:
+            return []
+        
+        rows = [self._inspection_values(data) for data in inspections]
+        statement = insert(InspectionRecord).returning(InspectionRecord.id, sort_by_parameter_order=True)
+        session = self.get_session()
+        try:
+            links = self._reference_links(session, inspections)
+            for row in rows:
+                link = links.get((row['part_number'] or '').strip().upper())
+                if link:
+                    row['datasheet_id'], row['reference_version'] = link
+                    row['reference_markings'] = None
+            
+            if self.engine.dialect.insert_executemany_returning_sort_by_parameter_order:
+                record_ids = list(session.scalars(statement, rows))
+            else:
+                # One statement per row, still one transaction and one commit
+                record_ids = [session.scalar(statement, row) for row in rows]
+            
+            differences = [
+                difference
+                for record_id, data in zip(record_ids, inspections)
+                for difference in self._difference_rows(record_id, data)
+            ]
+            if differences:
+                session.execute(insert(InspectionDifference), differences)
+            self._upsert_rollups(session, rollup_increments(rows))
+            session.commit()
+            logger.info("Saved %s inspection records", len(rows))
+            return record_ids
+        except Exception as e:
+            session.rollback()
+            logger.error("Error saving inspections: %s", e)
+            raise
+        finally:
+            session.close()
+    
+    def _upsert_rollups(self, session: Session, increments: List[Dict]):
+        """Add increments to their InspectionRollup buckets, creating missing ones"""
+        if not increments:
+            return
+        dialect_insert = {'sqlite': sqlite.insert, 'postgresql': postgresql.insert}.get(self.engine.dialect.name)
+        if dialect_insert is not None:
+            statement = dialect_insert(InspectionRollup)
+            statement = statement.on_conflict_do_update(
+                index_elements=list(ROLLUP_KEY),
+                set_={
+                    'count': InspectionRollup.count + statement.excluded.count,
+                    'confidence_sum': InspectionRollup.confidence_sum + statement.excluded.confidence_sum
+                }
             )
-            session.add(record)
+            session.execute(statement, increments)
+            return
+        
+        for increment in increments:
+            bucket = session.query(InspectionRollup).filter_by(
+                **{name: increment[name] for name in ROLLUP_KEY}
+            ).with_for_update().first()
+            if bucket is None:
+                session.add(InspectionRollup(**increment))
+            else:
+                bucket.count += increment['count']
+                bucket.confidence_sum += increment['confidence_sum']
+        session.flush()
+    
+    def rebuild_rollups(self, since: Optional[date] = None, batch_size: int = 10000) -> int:
+        """
+        Recompute InspectionRollup from inspection_records, from day since (or entirely)
+        For backfilling existing databases and repairs; run it while no inspections are saved.
+        
+        Returns:
+            Inspection records counted
+        """
+        session = self.get_session()
+        try:
+            query = select(
+                InspectionRecord.timestamp, InspectionRecord.part_number, InspectionRecord.oem_name,
+                InspectionRecord.station_id, InspectionRecord.status, InspectionRecord.confidence
+            )
+            cleared = delete(InspectionRollup)
+            if since:
+                query = query.where(InspectionRecord.timestamp >= datetime.combine(since, datetime.min.time()))
+                cleared = cleared.where(InspectionRollup.day >= since)
+            
+            counted = 0
+            buckets = {}
+            for chunk in session.execute(query.execution_options(yield_per=batch_size)).partitions():
+                for increment in rollup_increments(row._mapping for row in chunk):
+                    key = tuple(increment[name] for name in ROLLUP_KEY)
+                    if key in buckets:
+                        buckets[key]['count'] += increment['count']
+                        buckets[key]['confidence_sum'] += increment['confidence_sum']
+                    else:
+                        buckets[key] = increment
+                counted += len(chunk)
+            
+            session.execute(cleared)
+            if buckets:
+                session.execute(insert(InspectionRollup), list(buckets.values()))
             session.commit()
-            session.refresh(record)
-            logger.info(f"Saved inspection record: {record.id}")
-            return record
+            logger.info("Rebuilt %s rollup buckets from %s inspections", len(buckets), counted)
+            return counted
         except Exception as e:
             session.rollback()
-            logger.error(f"Error saving inspection: {e}")
+            logger.error("Error rebuilding rollups: %s", e)
             raise
         finally:
             session.close()
     
+    def close(self):
+        """Write out buffered inspection records and release pooled connections"""
+        self.writer.close()
+        self.engine.dispose()
+    
     def get_inspection(self, inspection_id: int) -> Optional[InspectionRecord]:
         """Retrieve an inspection record by ID"""
         session = self.get_session()
@@ -90,6 +329,212 @@ class DatabaseManager:
         finally:
             session.close()
     
+    def get_inspection_history(self, limit: Optional[int] = None, cursor: Optional[str] = None,
+                               part_number: Optional[str] = None, oem_name: Optional[str] = None,
+                               status: Optional[str] = None, since: Optional[datetime] = None,
+                               until: Optional[datetime] = None, difference_code: Optional[str] = None,
+                               difference_field: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
+        """
+        One page of inspection summaries, newest first
+        Only HISTORY_COLUMNS are selected, and pages are keyset-paginated on
+        (timestamp, id), so each page is a range read on the timestamp indexes
+        however deep it is.
+        
+        Args:
+            limit: Page size (defaults to Config.HISTORY_PAGE_SIZE, capped at Config.HISTORY_MAX_PAGE_SIZE)
+            cursor: next_cursor of the previous page
+            part_number, oem_name, status: Exact-match filters
+            since, until: Timestamp range, inclusive start and exclusive end
+            difference_code, difference_field: Only inspections with such a difference
+                (e.g. code 'date_code_invalid' or field 'date_code')
+        
+        Returns:
+            (rows as dicts, cursor of the next page or None on the last page)
+        """
+        limit = min(limit or Config.HISTORY_PAGE_SIZE, Config.HISTORY_MAX_PAGE_SIZE)
+        query = select(*HISTORY_COLUMNS)
+        if part_number:
+            query = query.where(InspectionRecord.part_number == part_number)
+        if oem_name:
+            query = query.where(InspectionRecord.oem_name == oem_name)
+        if status:
+            query = query.where(InspectionRecord.status == status)
+        if since:
+            query = query.where(InspectionRecord.timestamp >= since)
+        if until:
+            query = query.where(InspectionRecord.timestamp < until)
+        if difference_code or difference_field:
+            matches = select(InspectionDifference.inspection_id)
+            if difference_code:
+                matches = matches.where(InspectionDifference.code == difference_code)
+            if difference_field:
+                matches = matches.where(InspectionDifference.field == difference_field)
+            query = query.where(InspectionRecord.id.in_(matches))
+        if cursor:
+            timestamp, record_id = decode_cursor(cursor)
+            query = query.where(or_(
+                InspectionRecord.timestamp < timestamp,
+                and_(InspectionRecord.timestamp == timestamp, InspectionRecord.id < record_id)
+            ))
+        query = query.order_by(InspectionRecord.timestamp.desc(), InspectionRecord.id.desc()).limit(limit + 1)
+        
+        session = self.get_session()
+        try:
+            rows = [dict(row._mapping) for row in session.execute(query)]
+        finally:
+            session.close()
+        
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1]['timestamp'], rows[-1]['id'])
+        return rows, next_cursor
+    
+    def get_inspections_by_difference(self, code: Optional[str] = None, field: Optional[str] = None,
+                                      limit: Optional[int] = None,
+                                      cursor: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
+        """One page of inspections failing on a difference code and/or field, newest first"""
+        return self.get_inspection_history(limit, cursor, difference_code=code, difference_field=field)
+    
+    def get_inspection_differences(self, inspection_id: int) -> List[Dict]:
+        """Structured differences of an inspection"""
+        session = self.get_session()
+        try:
+            rows = session.execute(
+                select(InspectionDifference.field, InspectionDifference.code, InspectionDifference.message)
+                .where(InspectionDifference.inspection_id == inspection_id)
+                .order_by(InspectionDifference.id)
+            )
+            return [dict(row._mapping) for row in rows]
+        finally:
+            session.close()
+    
+    def get_reference_markings(self, inspection_id: int) -> Optional[Dict]:
+        """
+        Reference data of an inspection, from its own copy or its cache link
+        A linked reference is the cached one, which may be newer than reference_version.
+        """
+        session = self.get_session()
+        try:
+            row = session.execute(
+                select(InspectionRecord.reference_markings, DatasheetCache.marking_info)
+                .outerjoin(DatasheetCache, InspectionRecord.datasheet_id == DatasheetCache.id)
+                .where(InspectionRecord.id == inspection_id)
+            ).first()
+            if row is None:
+                return None
+            reference_markings = row.reference_markings or row.marking_info
+            return json.loads(reference_markings) if reference_markings else {}
+        finally:
+            session.close()
+    
+    @staticmethod
+    def _rollup_filters(query, since: Optional[date], until: Optional[date], part_number: Optional[str],
+                        oem_name: Optional[str], station_id: Optional[str]):
+        if since:
+            query = query.where(InspectionRollup.day >= since)
+        if until:
+            query = query.where(InspectionRollup.day <= until)
+        if part_number:
+            query = query.where(InspectionRollup.part_number == part_number)
+        if oem_name:
+            query = query.where(InspectionRollup.oem_name == oem_name)
+        if station_id:
+            query = query.where(InspectionRollup.station_id == station_id)
+        return query
+    
+    def get_stats(self, group_by: Sequence[str] = ('part_number',), since: Optional[date] = None,
+                  until: Optional[date] = None, part_number: Optional[str] = None,
+                  oem_name: Optional[str] = None, station_id: Optional[str] = None) -> List[Dict]:
+        """
+        Inspection counts, status rates and mean confidence from the rollups
+        
+        Args:
+            group_by: Any of STATS_GROUPS (empty for one overall row)
+            since, until: Inclusive range of UTC days
+            part_number, oem_name, station_id: Exact-match filters
+        
+        Returns:
+            One dict per group with its group_by values, total, genuine/fake/uncertain
+            counts and rates, and mean_confidence
+        """
+        unknown = [name for name in group_by if name not in STATS_GROUPS]
+        if unknown:
+            raise ValueError(f"Cannot group by {', '.join(unknown)}, expected any of {', '.join(STATS_GROUPS)}")
+        
+        columns = [getattr(InspectionRollup, name) for name in group_by]
+        status_counts = [
+            func.sum(case((InspectionRollup.status == status, InspectionRollup.count), else_=0)).label(status.lower())
+            for status in ('GENUINE', 'FAKE', 'UNCERTAIN')
+        ]
+        query = select(
+            *columns,
+            func.sum(InspectionRollup.count).label('total'),
+            *status_counts,
+            func.sum(InspectionRollup.confidence_sum).label('confidence_sum')
+        ).group_by(*columns).order_by(*columns)
+        query = self._rollup_filters(query, since, until, part_number, oem_name, station_id)
+        
+        session = self.get_session()
+        try:
+            rows = [dict(row._mapping) for row in session.execute(query)]
+        finally:
+            session.close()
+        
+        stats = []
+        for row in rows:
+            total = row['total'] or 0
+            if not total:
+                continue
+            if 'station_id' in row:
+                row['station_id'] = row['station_id'] or None
+            for status in ('genuine', 'fake', 'uncertain'):
+                row[f'{status}_rate'] = row[status] / total
+            row['mean_confidence'] = row.pop('confidence_sum') / total
+            stats.append(row)
+        return stats
+    
+    def get_confidence_histogram(self, since: Optional[date] = None, until: Optional[date] = None,
+                                 part_number: Optional[str] = None, oem_name: Optional[str] = None,
+                                 station_id: Optional[str] = None) -> List[Dict]:
+        """
+        Verification confidence distribution per status, from the rollups
+        
+        Returns:
+            One dict per bin with its lower/upper bound and GENUINE, FAKE and UNCERTAIN counts
+        """
+        query = select(
+            InspectionRollup.confidence_bin, InspectionRollup.status, func.sum(InspectionRollup.count)
+        ).group_by(InspectionRollup.confidence_bin, InspectionRollup.status)
+        query = self._rollup_filters(query, since, until, part_number, oem_name, station_id)
+        
+        session = self.get_session()
+        try:
+            rows = session.execute(query).all()
+        finally:
+            session.close()
+        
+        bins = Config.STATS_CONFIDENCE_BINS
+        histogram = [
+            {'lower': i / bins, 'upper': (i + 1) / bins, 'GENUINE': 0, 'FAKE': 0, 'UNCERTAIN': 0}
+            for i in range(bins)
+        ]
+        for index, status, count in rows:
+            histogram[index][status] = histogram[index].get(status, 0) + count
+        return histogram
+    
+    def get_known_parts(self) -> List[Tuple[str, str]]:
+        """Distinct (part_number, oem_name) pairs from the datasheet cache and past inspections"""
+        session = self.get_session()
+        try:
+            cached = session.query(DatasheetCache.part_number, DatasheetCache.oem_name).filter(
+                DatasheetCache.is_valid == True
+            ).distinct()
+            inspected = session.query(InspectionRecord.part_number, InspectionRecord.oem_name).distinct()
+            return [tuple(row) for row in cached.union(inspected).all()]
+        finally:
+            session.close()
+    
     # Datasheet Cache Operations
     
     def get_cached_datasheet(self, part_number: str, max_age_days: int = 30) -> Optional[DatasheetCache]:
@@ -104,16 +549,17 @@ class DatabaseManager:
             if cache:
                 age = datetime.utcnow() - cache.last_updated
                 if age.days > max_age_days:
-                    logger.info(f"Cache expired for {part_number}")
+                    logger.info("Cache expired for %s", part_number)
                     return None
-                logger.info(f"Cache hit for {part_number}")
+                logger.info("Cache hit for %s", part_number)
                 return cache
             
-            logger.info(f"Cache miss for {part_number}")
+            logger.info("Cache miss for %s", part_number)
             return None
         finally:
             session.close()
     
+    @timed('db.save_datasheet_cache')
     def save_datasheet_cache(self, cache_data: Dict) -> DatasheetCache:
         """Save or update datasheet cache"""
         session = self.get_session()
@@ -125,13 +571,17 @@ class DatabaseManager:
             
             if existing:
                 # Update existing cache
+                marking_info = json.dumps(cache_data.get('marking_info', {}))
+                if (existing.datasheet_url, existing.marking_info) != (cache_data.get('datasheet_url'), marking_info):
+                    # Linked inspections record the version they were verified against
+                    existing.version = (existing.version or 1) + 1
                 existing.oem_name = cache_data.get('oem_name', existing.oem_name)
                 existing.datasheet_url = cache_data.get('datasheet_url')
-                existing.marking_info = json.dumps(cache_data.get('marking_info', {}))
+                existing.marking_info = marking_info
                 existing.last_updated = datetime.utcnow()
                 existing.is_valid = True
                 cache = existing
-                logger.info(f"Updated cache for {cache_data['part_number']}")
+                logger.info("Updated cache for %s", cache_data['part_number'])
             else:
                 # Create new cache
                 cache = DatasheetCache(
@@ -142,14 +592,14 @@ class DatabaseManager:
                     is_valid=True
                 )
                 session.add(cache)
-                logger.info(f"Created cache for {cache_data['part_number']}")
+                logger.info("Created cache for %s", cache_data['part_number'])
             
             session.commit()
             session.refresh(cache)
             return cache
         except Exception as e:
             session.rollback()
-            logger.error(f"Error saving datasheet cache: {e}")
+            logger.error("Error saving datasheet cache: %s", e)
             raise
         finally:
             session.close()
@@ -164,6 +614,59 @@ class DatabaseManager:
             if cache:
                 cache.is_valid = False
                 session.commit()
-                logger.info(f"Invalidated cache for {part_number}")
+                logger.info("Invalidated cache for %s", part_number)
+        finally:
+            session.close()
+    
+    # OCR Result Cache Operations
+    
+    def get_ocr_result(self, image_hash: str, config_version: str) -> Optional[Dict]:
+        """Retrieve a memoized OCR result for an image and OCR configuration"""
+        session = self.get_session()
+        try:
+            cached = session.query(OCRResultCache).filter(
+                OCRResultCache.image_hash == image_hash,
+                OCRResultCache.config_version == config_version
+            ).first()
+            # Entries saved before word boxes were stored can't be aligned line by line
+            if cached is None or cached.words is None:
+                return None
+            logger.info("OCR cache hit for %s", image_hash[:12])
+            return {
+                'text': cached.extracted_text or '',
+                'confidence': cached.ocr_confidence or 0,
+                'variant': cached.variant,
+                'words': json.loads(cached.words)
+            }
+        finally:
+            session.close()
+    
+    @timed('db.save_ocr_result')
+    def save_ocr_result(self, image_hash: str, config_version: str, ocr_result: Dict):
+        """Memoize an OCR result (replacing a stale entry); a concurrent save of the same key is ignored"""
+        session = self.get_session()
+        try:
+            values = {
+                'extracted_text': ocr_result.get('text'),
+                'ocr_confidence': ocr_result.get('confidence'),
+                'variant': ocr_result.get('variant'),
+                'words': json.dumps(ocr_result.get('words') or [])
+            }
+            cached = session.query(OCRResultCache).filter(
+                OCRResultCache.image_hash == image_hash,
+                OCRResultCache.config_version == config_version
+            ).first()
+            if cached is None:
+                session.add(OCRResultCache(image_hash=image_hash, config_version=config_version, **values))
+            else:
+                for name, value in values.items():
+                    setattr(cached, name, value)
+            session.commit()
+        except IntegrityError:
+            session.rollback()
+        except Exception as e:
+            session.rollback()
+            logger.error("Error saving OCR result: %s", e)
+            raise
         finally:
             session.close()
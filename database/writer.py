@@ -0,0 +1,151 @@
+import atexit
+import threading
+import time
+from concurrent.futures import Future, wait
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from config import Config
+from utils import setup_logger, REGISTRY
+
+logger = setup_logger(__name__)
+
+BATCH_SIZES = REGISTRY.histogram(
+    'ic_db_write_batch_size', "Inspection records per buffered database flush",
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500)
+)
+
+
+class BufferedInspectionWriter:
+    """
+    Group commits for inspection records
+    Records submitted from any thread are buffered and written by one background
+    thread, each flush being a single transaction with one bulk INSERT. A flush
+    happens once batch_size records are waiting or the oldest has waited
+    flush_interval seconds. Every buffered record is written before close()
+    returns, and close() runs at interpreter exit.
+    """
+    
+    def __init__(self, db_manager, batch_size: Optional[int] = None, flush_interval: Optional[float] = None,
+                 max_pending: Optional[int] = None):
+        self.db_manager = db_manager
+        self.batch_size = batch_size or Config.DB_WRITE_BATCH_SIZE
+        self.flush_interval = flush_interval if flush_interval is not None else Config.DB_WRITE_INTERVAL
+        self.max_pending = max_pending or Config.DB_WRITE_MAX_PENDING
+        
+        # (record, future, monotonic submit time), oldest first
+        self._pending: List[Tuple[Dict, Future, float]] = []
+        self._flush_requested = False
+        self._closed = False
+        self._thread = None
+        self._cond = threading.Condition()
+    
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+    
+    def submit(self, inspection_data: Dict, flush: bool = False) -> Future:
+        """
+        Buffer a record for writing, blocking while max_pending records are already waiting
+        With flush the record is written as soon as the writer is free rather than
+        on size or interval; records arriving meanwhile join the same commit.
+        
+        Returns:
+            Future resolving to the record's id once it is committed
+        """
+        future = Future()
+        with self._cond:
+            while len(self._pending) >= self.max_pending and not self._closed:
+                self._cond.wait()
+            if self._closed:
+                raise RuntimeError("Inspection writer is closed")
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='db_writer', daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+            self._pending.append((inspection_data, future, time.monotonic()))
+            if flush:
+                self._flush_requested = True
+            if flush or len(self._pending) == 1 or len(self._pending) >= self.batch_size:
+                self._cond.notify_all()
+        return future
+    
+    def submit_many(self, inspections: Iterable[Dict], flush: bool = False) -> List[Future]:
+        """Buffer several records; with flush they are written once the last one is buffered"""
+        inspections = list(inspections)
+        return [self.submit(inspection_data, flush and index == len(inspections) - 1)
+                for index, inspection_data in enumerate(inspections)]
+    
+    def write(self, inspection_data: Dict, timeout: Optional[float] = None) -> int:
+        """Write a record and wait until it is committed; returns its id"""
+        return self.submit(inspection_data, flush=True).result(timeout)
+    
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Write everything buffered now; returns whether it finished within timeout"""
+        with self._cond:
+            futures = [future for _, future, _ in self._pending]
+            if not futures:
+                return True
+            self._flush_requested = True
+            self._cond.notify_all()
+        _, not_done = wait(futures, timeout)
+        return not not_done
+    
+    def close(self):
+        """Write every buffered record and stop the writer thread"""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join()
+            logger.info("Inspection writer closed")
+    
+    def _ready(self) -> bool:
+        """Whether a flush is due (called with the lock held)"""
+        if self._closed or self._flush_requested or len(self._pending) >= self.batch_size:
+            return True
+        return bool(self._pending) and time.monotonic() >= self._deadline()
+    
+    def _deadline(self) -> float:
+        """Monotonic time the oldest pending record is due (called with the lock held)"""
+        return self._pending[0][2] + self.flush_interval
+    
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._ready():
+                    timeout = self._deadline() - time.monotonic() if self._pending else None
+                    self._cond.wait(timeout)
+                if not self._pending:
+                    if self._closed:
+                        return
+                    self._flush_requested = False
+                    continue
+                
+                # Records left behind keep their submit times, so they still flush on schedule
+                batch = [entry[:2] for entry in self._pending[:self.batch_size]]
+                del self._pending[:self.batch_size]
+                if not self._pending:
+                    self._flush_requested = False
+                self._cond.notify_all()  # wake submitters blocked on max_pending
+            
+            self._write(batch)
+    
+    def _write(self, batch: List[Tuple[Dict, Future]]):
+        """Insert a batch in one transaction, falling back to row by row so one bad record can't sink the rest"""
+        try:
+            record_ids = self.db_manager.insert_inspections([inspection_data for inspection_data, _ in batch])
+        except Exception as e:
+            if len(batch) == 1:
+                batch[0][1].set_exception(e)
+                return
+            logger.warning("Bulk write of %s inspections failed, writing them one by one: %s", len(batch), e)
+            for item in batch:
+                self._write([item])
+            return
+        
+        BATCH_SIZES.observe(len(batch))
+        for (_, future), record_id in zip(batch, record_ids):
+            future.set_result(record_id)
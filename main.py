@@ -1,3 +1,4 @@
+from typing import Dict, Iterator, List, Optional, Tuple
 from config import Config
 from database import DatabaseManager
 from ocr import OCREngine
@@ -33,27 +34,80 @@ class ICInspectionSystem:
         
         logger.info("IC Inspection System initialized successfully")
     
-    def inspect_ic(self, image_path: str, ic_part_number: str, oem_name: str):
+    def inspect_ic(self, image_path: str, ic_part_number: str, oem_name: str,
+                   image_hash: Optional[str] = None, image=None, profile: Optional[str] = None,
+                   station_id: Optional[str] = None):
         """
         Inspect an IC image and verify its authenticity
         
         Args:
             image_path: Path to IC image
-            ic_part_number: Expected IC part number
+            ic_part_number: Expected IC part number (empty to identify it from the marking)
             oem_name: OEM manufacturer name
+            image_hash: SHA-256 of the image file; enables the OCR result cache
+            image: Encoded image bytes or decoded array to OCR instead of reading image_path
+            profile: Preprocessing profile (fast, balanced or accurate); defaults to the configured one
+            station_id: Inspection station the result is counted under; defaults to STATION_ID
         
         Returns:
             Inspection result dictionary
         """
-        logger.info(f"Starting inspection for {ic_part_number} from {oem_name}")
+        logger.info("Starting inspection for %s from %s", ic_part_number, oem_name)
         
         try:
-            result = self.agent.inspect(image_path, ic_part_number, oem_name)
-            logger.info(f"Inspection complete: {result['status']}")
+            result = self.agent.inspect(image_path, ic_part_number, oem_name, image_hash, image, profile,
+                                       station_id)
+            logger.info("Inspection complete: %s", result['status'])
             return result
         except Exception as e:
-            logger.error(f"Inspection failed: {e}")
+            logger.error("Inspection failed: %s", e)
             raise
+    
+    def inspect_tray(self, image_path: str, ic_part_number: str, oem_name: str, image=None,
+                     profile: Optional[str] = None, station_id: Optional[str] = None) -> List[Dict]:
+        """
+        Inspect every IC in a single frame, such as a photo of a tray
+        
+        Args:
+            image_path: Path to the frame
+            ic_part_number: Expected part number of every chip (empty to identify each one)
+            oem_name: OEM manufacturer name
+            image: Encoded image bytes or decoded array to use instead of reading image_path
+            profile: Preprocessing profile; defaults to the configured one
+            station_id: Inspection station the results are counted under; defaults to STATION_ID
+        
+        Returns:
+            One inspection result per detected IC, in reading order
+        """
+        logger.info("Starting tray inspection for %s from %s", ic_part_number, oem_name)
+        
+        try:
+            results = self.agent.inspect_tray(image_path, ic_part_number, oem_name, image, profile, station_id)
+            logger.info("Tray inspection complete: %s ICs", len(results))
+            return results
+        except Exception as e:
+            logger.error("Tray inspection failed: %s", e)
+            raise
+    
+    def inspect_batch(self, items: List[Dict], max_workers: Optional[int] = None,
+                      profile: Optional[str] = None) -> Iterator[Tuple[int, Dict]]:
+        """
+        Inspect a lot of IC images
+        
+        Args:
+            items: Dicts with image_path, part_number, oem_name and optionally station_id
+            max_workers: Number of OCR processes
+            profile: Preprocessing profile; defaults to the configured one
+        
+        Yields:
+            (index, inspection result) pairs in completion order
+        """
+        logger.info("Starting batch inspection of %s images", len(items))
+        counts = {}
+        for index, result in self.agent.inspect_batch(items, max_workers, profile):
+            counts[result['status']] = counts.get(result['status'], 0) + 1
+            yield index, result
+        logger.info("Batch inspection complete: %s", counts)
 
 if __name__ == "__main__":
     # Example usage
@@ -1,4 +1,9 @@
-from .image_processor import ImageProcessor
+from .backends import OCRBackend, PytesseractBackend, TesserocrBackend, create_backend
+from .image_processor import ImageProcessor, ImageSource, VariantGraph
 from .ocr_engine import OCREngine
+from .variant_scheduler import VariantScheduler
 
-__all__ = ['ImageProcessor', 'OCREngine']
+__all__ = [
+    'OCRBackend', 'PytesseractBackend', 'TesserocrBackend', 'create_backend',
+    'ImageProcessor', 'ImageSource', 'VariantGraph', 'OCREngine', 'VariantScheduler'
+]
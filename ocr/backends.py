@@ -0,0 +1,151 @@
+import pytesseract
+import numpy as np
+from typing import Dict, List, Optional
+import threading
+
+from config import Config
+from utils import setup_logger
+
+try:
+    import tesserocr
+except ImportError:  # optional dependency
+    tesserocr = None
+
+logger = setup_logger(__name__)
+
+# Keys of pytesseract's image_to_data dictionary output
+DATA_KEYS = ('level', 'page_num', 'block_num', 'par_num', 'line_num', 'word_num',
+             'left', 'top', 'width', 'height', 'conf', 'text')
+
+
+class OCRBackend:
+    """Interface for OCR backends returning Tesseract-style word data"""
+    
+    name = 'base'
+    
+    def image_to_data(self, image: np.ndarray, psm: Optional[int] = None) -> Dict[str, List]:
+        """Recognize an image and return word data in pytesseract's DICT layout"""
+        raise NotImplementedError
+    
+    def close(self):
+        """Release any resources held by the backend"""
+        pass
+
+
+class PytesseractBackend(OCRBackend):
+    """Runs the tesseract binary through pytesseract, one subprocess per call"""
+    
+    name = 'pytesseract'
+    
+    def __init__(self, lang: Optional[str] = None):
+        pytesseract.pytesseract.tesseract_cmd = Config.TESSERACT_CMD
+        self.lang = lang or Config.OCR_LANGUAGE
+    
+    def image_to_data(self, image: np.ndarray, psm: Optional[int] = None) -> Dict[str, List]:
+        config = f"--psm {psm}" if psm is not None else ''
+        return pytesseract.image_to_data(
+            image, lang=self.lang, config=config, output_type=pytesseract.Output.DICT
+        )
+
+
+class TesserocrBackend(OCRBackend):
+    """
+    Keeps a warm Tesseract API handle per worker thread via tesserocr
+    Images are passed straight from the numpy buffer, without temp files
+    """
+    
+    name = 'tesserocr'
+    
+    def __init__(self, lang: Optional[str] = None, tessdata_path: Optional[str] = None):
+        if tesserocr is None:
+            raise ImportError("tesserocr is not installed")
+        self.lang = lang or Config.OCR_LANGUAGE
+        self.tessdata_path = tessdata_path or Config.TESSDATA_PATH
+        self._local = threading.local()
+        self._apis = []
+        self._lock = threading.Lock()
+        # Load the model now so configuration errors surface at startup
+        self._get_api()
+    
+    def _get_api(self):
+        """Return this thread's API handle, creating it on first use"""
+        api = getattr(self._local, 'api', None)
+        if api is None:
+            kwargs = {'lang': self.lang}
+            if self.tessdata_path:
+                kwargs['path'] = self.tessdata_path
+            api = tesserocr.PyTessBaseAPI(**kwargs)
+            self._local.api = api
+            with self._lock:
+                self._apis.append(api)
+            logger.info("Loaded tesserocr model '%s' in %s", self.lang, threading.current_thread().name)
+        return api
+    
+    def image_to_data(self, image: np.ndarray, psm: Optional[int] = None) -> Dict[str, List]:
+        api = self._get_api()
+        api.SetPageSegMode(psm if psm is not None else tesserocr.PSM.AUTO)
+        
+        if image.ndim == 3:
+            # OpenCV images are BGR, Tesseract expects RGB
+            image = image[:, :, ::-1]
+        image = np.ascontiguousarray(image, dtype=np.uint8)
+        height, width = image.shape[:2]
+        channels = 1 if image.ndim == 2 else image.shape[2]
+        api.SetImageBytes(image.tobytes(), width, height, channels, width * channels)
+        api.Recognize()
+        return self._collect_words(api)
+    
+    @staticmethod
+    def _collect_words(api) -> Dict[str, List]:
+        """Walk the result iterator at word level into pytesseract's DICT layout"""
+        data = {key: [] for key in DATA_KEYS}
+        iterator = api.GetIterator()
+        if iterator is None:
+            return data
+        
+        level = tesserocr.RIL.WORD
+        block = par = line = word = 0
+        for item in tesserocr.iterate_level(iterator, level):
+            text = item.GetUTF8Text(level)
+            if text is None:
+                continue
+            if item.IsAtBeginningOf(tesserocr.RIL.BLOCK):
+                block, par = block + 1, 0
+            if item.IsAtBeginningOf(tesserocr.RIL.PARA):
+                par, line = par + 1, 0
+            if item.IsAtBeginningOf(tesserocr.RIL.TEXTLINE):
+                line, word = line + 1, 0
+            word += 1
+            
+            x1, y1, x2, y2 = item.BoundingBox(level) or (0, 0, 0, 0)
+            values = (5, 1, block, par, line, word, x1, y1, x2 - x1, y2 - y1,
+                      item.Confidence(level), text)
+            for key, value in zip(DATA_KEYS, values):
+                data[key].append(value)
+        return data
+    
+    def close(self):
+        with self._lock:
+            for api in self._apis:
+                api.End()
+            self._apis = []
+        self._local = threading.local()
+
+
+def create_backend(name: Optional[str] = None) -> OCRBackend:
+    """
+    Create an OCR backend by name ('auto', 'tesserocr' or 'pytesseract')
+    Falls back to pytesseract when tesserocr is unavailable
+    """
+    name = (name or Config.OCR_BACKEND).lower()
+    if name in ('auto', 'tesserocr'):
+        if tesserocr is not None:
+            try:
+                return TesserocrBackend()
+            except Exception as e:
+                logger.warning("tesserocr backend unavailable, falling back to pytesseract: %s", e)
+        elif name == 'tesserocr':
+            logger.warning("tesserocr is not installed, falling back to pytesseract")
+    elif name != 'pytesseract':
+        raise ValueError(f"Unknown OCR backend: {name}")
+    return PytesseractBackend()
@@ -1,21 +1,45 @@
 import cv2
 import numpy as np
 from PIL import Image
-from typing import Tuple, List, Optional
+from typing import Dict, Iterator, Tuple, List, Optional, Union
+import threading
 import os
 
 from config import Config
-from utils import setup_logger
+from utils import setup_logger, span
 
 logger = setup_logger(__name__)
 
+# A file path, encoded image bytes or a decoded OpenCV image
+ImageSource = Union[str, bytes, np.ndarray]
+
 
 class ImageProcessor:
     """Handles image preprocessing for OCR"""
     
-    def __init__(self):
+    # Names of the versions returned by preprocess_for_ocr, in order
+    VARIANT_NAMES = ('clahe', 'denoised', 'adaptive', 'otsu', 'clahe_denoised')
+    
+    # Preprocessing profiles: denoising filter and the text height (pixels) images
+    # are scaled down to, None keeping the full resolution
+    PROFILES = {
+        'fast': {'denoise': 'median', 'text_height': 32},
+        'balanced': {'denoise': 'nlm_downscaled', 'text_height': 48},
+        'accurate': {'denoise': 'nlm', 'text_height': None},
+    }
+    
+    # Localized lines must hold this share of the character-sized blobs and cover
+    # this share of the image, otherwise the whole image is OCR'd
+    MIN_TEXT_COVERAGE = 0.5
+    MIN_TEXT_AREA = 0.01
+    
+    def __init__(self, profile: Optional[str] = None):
         self.max_width = Config.IMAGE_MAX_WIDTH
         self.max_height = Config.IMAGE_MAX_HEIGHT
+        self.profile = profile or Config.PREPROCESSING_PROFILE
+        if self.profile not in self.PROFILES:
+            raise ValueError(f"Unknown preprocessing profile: {self.profile}")
+        self.settings = self.PROFILES[self.profile]
     
     def load_image(self, image_path: str) -> np.ndarray:
         """Load image from file path"""
@@ -26,9 +50,27 @@ class ImageProcessor:
         if image is None:
             raise ValueError(f"Failed to load image: {image_path}")
         
-        logger.info(f"Loaded image: {image_path}, shape: {image.shape}")
+        logger.info("Loaded image: %s, shape: %s", image_path, image.shape)
         return image
     
+    def decode_image(self, data: bytes) -> np.ndarray:
+        """Decode an encoded image (JPEG, PNG, ...) from memory"""
+        buffer = np.frombuffer(data, dtype=np.uint8)
+        image = cv2.imdecode(buffer, cv2.IMREAD_COLOR) if buffer.size else None
+        if image is None:
+            raise ValueError("Failed to decode image data")
+        
+        logger.info("Decoded image from memory, shape: %s", image.shape)
+        return image
+    
+    def load(self, source: ImageSource) -> np.ndarray:
+        """Load an image from a file path, encoded bytes or an already decoded array"""
+        if isinstance(source, np.ndarray):
+            return source
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            return self.decode_image(source)
+        return self.load_image(source)
+    
     def resize_image(self, image: np.ndarray) -> np.ndarray:
         """Resize image if it exceeds maximum dimensions"""
         height, width = image.shape[:2]
@@ -42,7 +84,7 @@ class ImageProcessor:
         new_height = int(height * scale)
         
         resized = cv2.resize(image, (new_width, new_height), interpolation=cv2.INTER_AREA)
-        logger.info(f"Resized image from {width}x{height} to {new_width}x{new_height}")
+        logger.info("Resized image from %sx%s to %sx%s", width, height, new_width, new_height)
         return resized
     
     def convert_to_grayscale(self, image: np.ndarray) -> np.ndarray:
@@ -61,11 +103,42 @@ class ImageProcessor:
         return enhanced
     
     def denoise_image(self, image: np.ndarray) -> np.ndarray:
-        """Apply denoising to image"""
-        denoised = cv2.fastNlMeansDenoising(image, None, h=10, templateWindowSize=7, searchWindowSize=21)
-        logger.debug("Applied denoising")
+        """Apply denoising to image, using the filter of the preprocessing profile"""
+        method = self.settings['denoise']
+        if method == 'median':
+            denoised = cv2.medianBlur(image, 3)
+        elif method == 'nlm_downscaled':
+            # Non-local means at half resolution costs about a quarter of the full run
+            height, width = image.shape[:2]
+            small = cv2.resize(image, (max(width // 2, 1), max(height // 2, 1)), interpolation=cv2.INTER_AREA)
+            small = cv2.fastNlMeansDenoising(small, None, h=10, templateWindowSize=7, searchWindowSize=21)
+            denoised = cv2.resize(small, (width, height), interpolation=cv2.INTER_LINEAR)
+        else:
+            denoised = cv2.fastNlMeansDenoising(image, None, h=10, templateWindowSize=7, searchWindowSize=21)
+        logger.debug("Applied %s denoising", method)
         return denoised
     
+    def fit_text_height(self, gray: np.ndarray) -> np.ndarray:
+        """
+        Scale an image down so its text lines are about the profile's text height
+        Images are never enlarged, and are left alone when no text line is found
+        """
+        target = self.settings['text_height']
+        if not target:
+            return gray
+        
+        heights = [h for _, _, _, h in self.localize_text(gray)]
+        if not heights:
+            return gray
+        scale = target / float(np.median(heights))
+        if scale >= 1:
+            return gray
+        
+        height, width = gray.shape[:2]
+        size = (max(int(width * scale), 1), max(int(height * scale), 1))
+        logger.debug("Scaled %sx%s to %sx%s for %spx text", width, height, size[0], size[1], target)
+        return cv2.resize(gray, size, interpolation=cv2.INTER_AREA)
+    
     def apply_threshold(self, image: np.ndarray, method: str = 'adaptive') -> np.ndarray:
         """Apply thresholding to binarize image"""
         if method == 'adaptive':
@@ -78,9 +151,104 @@ class ImageProcessor:
         else:
             _, threshold = cv2.threshold(image, 127, 255, cv2.THRESH_BINARY)
         
-        logger.debug(f"Applied {method} thresholding")
+        logger.debug("Applied %s thresholding", method)
         return threshold
     
+    def _text_lines(self, gray: np.ndarray) -> Tuple[List[Tuple[int, int, int, int]], float]:
+        """
+        Find marking text lines in a grayscale image
+        Character strokes light up in the morphological gradient of the
+        median-filtered image; closing it horizontally over about one character
+        height merges each line into one blob.
+        
+        Returns:
+            (x, y, w, h) line boxes top to bottom, and the share of character-sized
+            blobs that lie in one of them
+        """
+        height, width = gray.shape[:2]
+        kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
+        gradient = cv2.morphologyEx(cv2.medianBlur(gray, 5), cv2.MORPH_GRADIENT, kernel)
+        _, binary = cv2.threshold(gradient, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        
+        # Character outlines are separate blobs; their median height sets the scale
+        _, _, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+        chars = [
+            (x, y, w, h) for x, y, w, h, area in stats[1:]
+            if 8 <= h <= height * 0.3 and w <= h * 2 and area >= h
+        ]
+        if not chars:
+            return [], 0.0
+        char_height = int(np.median([h for _, _, _, h in chars]))
+        
+        line_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (char_height, max(char_height // 6, 1)))
+        closed = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, line_kernel)
+        # Not just external contours: the package outline would enclose every line
+        contours, _ = cv2.findContours(closed, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
+        
+        boxes = []
+        for contour in contours:
+            x, y, w, h = cv2.boundingRect(contour)
+            # Merged lines are wider than tall, about a character high, and not the package outline
+            if h < char_height * 0.5 or h > min(char_height * 4, height * 0.5) or w < h or w > width * 0.95:
+                continue
+            boxes.append((x, y, w, h))
+        
+        # Drop holes inside letters and other boxes nested in a kept line
+        boxes = [
+            box for box in boxes
+            if not any(other != box and self._contains(other, box) for other in boxes)
+        ]
+        boxes.sort(key=lambda box: box[1])
+        
+        covered = sum(
+            any(self._contains(box, (x + w // 2, y + h // 2, 0, 0)) for box in boxes)
+            for x, y, w, h in chars
+        )
+        logger.debug("Localized %s text lines (%spx characters)", len(boxes), char_height)
+        return boxes, covered / len(chars)
+    
+    def localize_text(self, gray: np.ndarray) -> List[Tuple[int, int, int, int]]:
+        """Find marking text lines in a grayscale image; returns (x, y, w, h) boxes, top to bottom"""
+        return self._text_lines(gray)[0]
+    
+    @staticmethod
+    def _contains(outer: Tuple[int, int, int, int], inner: Tuple[int, int, int, int]) -> bool:
+        ox, oy, ow, oh = outer
+        ix, iy, iw, ih = inner
+        return ox <= ix and oy <= iy and ix + iw <= ox + ow and iy + ih <= oy + oh
+    
+    def crop_text_regions(self, gray: np.ndarray) -> np.ndarray:
+        """
+        Stack the localized text lines of a grayscale image into one compact image
+        Falls back to the whole image when the lines miss most character-sized
+        blobs or cover an implausibly small part of the image.
+        """
+        boxes, coverage = self._text_lines(gray)
+        height, width = gray.shape[:2]
+        area = sum(w * h for _, _, w, h in boxes) / float(height * width)
+        if not boxes or coverage < self.MIN_TEXT_COVERAGE or area < self.MIN_TEXT_AREA:
+            logger.debug("Text lines not localized (coverage %.2f, area %.3f), using the full image",
+                         coverage, area)
+            return gray
+        
+        rois = []
+        for x, y, w, h in boxes:
+            pad = max(h // 4, 4)
+            rois.append(gray[max(y - pad, 0):min(y + h + pad, height), max(x - pad, 0):min(x + w + pad, width)])
+        
+        # Pad every line to a common width with its own background level
+        stacked_width = max(roi.shape[1] for roi in rois)
+        rows = []
+        for roi in rois:
+            row = np.full((roi.shape[0], stacked_width), int(np.median(roi)), dtype=gray.dtype)
+            row[:, :roi.shape[1]] = roi
+            rows.append(row)
+        stacked = np.vstack(rows)
+        
+        logger.debug("Stacked %s text lines: %sx%s from %sx%s",
+                     len(rois), stacked.shape[1], stacked.shape[0], width, height)
+        return stacked
+    
     def detect_ic_region(self, image: np.ndarray) -> Optional[Tuple[int, int, int, int]]:
         """Detect the IC chip region in the image using contour detection"""
         # Convert to grayscale if needed
@@ -111,61 +279,255 @@ class ImageProcessor:
             logger.warning("Detected region size is out of expected range")
             return None
         
-        logger.info(f"Detected IC region: x={x}, y={y}, w={w}, h={h}")
+        logger.info("Detected IC region: x=%s, y=%s, w=%s, h=%s", x, y, w, h)
         return (x, y, w, h)
     
+    def detect_ic_regions(self, image: np.ndarray) -> List[Tuple[Tuple[float, float], Tuple[float, float], float]]:
+        """
+        Detect every IC-like rectangle in the image (e.g. a tray of chips)
+        Returns cv2.minAreaRect rectangles ((cx, cy), (w, h), angle) in reading order,
+        filtered by area and aspect ratio
+        """
+        gray = self.convert_to_grayscale(image)
+        edges = cv2.Canny(gray, 50, 150)
+        
+        # Close small gaps so each package outline forms one external contour
+        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (5, 5))
+        edges = cv2.morphologyEx(edges, cv2.MORPH_CLOSE, kernel)
+        contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        
+        image_area = image.shape[0] * image.shape[1]
+        min_area = image_area * Config.TRAY_MIN_REGION_AREA
+        max_area = image_area * Config.TRAY_MAX_REGION_AREA
+        
+        regions = []
+        for contour in contours:
+            rect = cv2.minAreaRect(contour)
+            width, height = rect[1]
+            area = width * height
+            if area < min_area or area > max_area:
+                continue
+            if max(width, height) / max(min(width, height), 1) > Config.TRAY_MAX_ASPECT:
+                continue
+            # Skip irregular blobs that only loosely fill their rectangle
+            if cv2.contourArea(contour) < area * 0.6:
+                continue
+            regions.append(rect)
+        
+        regions = self._reading_order(regions)[:Config.TRAY_MAX_REGIONS]
+        
+        logger.info("Detected %s IC regions", len(regions))
+        return regions
+    
+    @staticmethod
+    def _reading_order(regions: List[Tuple[Tuple[float, float], Tuple[float, float], float]]
+                       ) -> List[Tuple[Tuple[float, float], Tuple[float, float], float]]:
+        """
+        Sort rectangles into rows top to bottom, then left to right within a row
+        A row starts once a centre lies more than half a chip height below the
+        first centre of the current row, so chips a few pixels apart in y stay
+        in the same row wherever the row falls in the frame.
+        """
+        if not regions:
+            return []
+        half_height = float(np.median([min(rect[1]) for rect in regions])) / 2
+        rows = []
+        for rect in sorted(regions, key=lambda rect: rect[0][1]):
+            if rows and rect[0][1] - rows[-1][0][0][1] <= half_height:
+                rows[-1].append(rect)
+            else:
+                rows.append([rect])
+        return [rect for row in rows for rect in sorted(row, key=lambda rect: rect[0][0])]
+    
+    @staticmethod
+    def normalize_rect(rect: Tuple[Tuple[float, float], Tuple[float, float], float]
+                       ) -> Tuple[Tuple[float, float], Tuple[float, float], float]:
+        """Express a rotated rectangle with its long side as width and its angle in (-90, 90]"""
+        (cx, cy), (width, height), angle = rect
+        if width < height:
+            width, height = height, width
+            angle += 90
+        if angle > 90:
+            angle -= 180
+        elif angle <= -90:
+            angle += 180
+        return (cx, cy), (width, height), angle
+    
+    def crop_rotated(self, image: np.ndarray,
+                     rect: Tuple[Tuple[float, float], Tuple[float, float], float]) -> np.ndarray:
+        """Crop a rotated rectangle, deskewed so its long side is horizontal"""
+        (cx, cy), (width, height), angle = self.normalize_rect(rect)
+        
+        # Rotate only a patch around the rectangle rather than the whole frame
+        radius = int(np.ceil(np.hypot(width, height) / 2)) + 1
+        x0, y0 = max(int(cx) - radius, 0), max(int(cy) - radius, 0)
+        patch = image[y0:int(cy) + radius + 1, x0:int(cx) + radius + 1]
+        center = (cx - x0, cy - y0)
+        
+        matrix = cv2.getRotationMatrix2D(center, angle, 1.0)
+        rotated = cv2.warpAffine(patch, matrix, (patch.shape[1], patch.shape[0]),
+                                 flags=cv2.INTER_CUBIC, borderMode=cv2.BORDER_REPLICATE)
+        cropped = cv2.getRectSubPix(rotated, (int(round(width)), int(round(height))), center)
+        logger.debug("Cropped rotated region at (%.0f, %.0f), angle %.1f", cx, cy, angle)
+        return cropped
+    
     def crop_to_region(self, image: np.ndarray, region: Tuple[int, int, int, int]) -> np.ndarray:
         """Crop image to specified region"""
         x, y, w, h = region
         cropped = image[y:y+h, x:x+w]
-        logger.debug(f"Cropped image to region: {region}")
+        logger.debug("Cropped image to region: %s", region)
         return cropped
     
-    def preprocess_for_ocr(self, image_path: str, auto_detect_ic: bool = True) -> List[np.ndarray]:
+    def prepare(self, source: ImageSource, auto_detect_ic: bool = True) -> 'VariantGraph':
         """
-        Complete preprocessing pipeline for OCR
-        Returns multiple processed versions for better OCR results
+        Load, resize and crop an image, returning a lazy graph of its processed versions
+        source may be a file path, encoded image bytes or a decoded array;
+        nothing beyond the crop is computed until a version is requested
         """
         # Load and resize
-        image = self.load_image(image_path)
-        image = self.resize_image(image)
+        with span('load'):
+            image = self.load(source)
+        with span('resize'):
+            image = self.resize_image(image)
         
         # Detect IC region if requested
         if auto_detect_ic:
-            region = self.detect_ic_region(image)
-            if region:
-                image = self.crop_to_region(image, region)
+            with span('detect'):
+                region = self.detect_ic_region(image)
+                if region:
+                    image = self.crop_to_region(image, region)
         
-        # Convert to grayscale
-        gray = self.convert_to_grayscale(image)
-        
-        # Create multiple processed versions
-        processed_images = []
-        
-        # Version 1: Enhanced contrast
-        enhanced = self.enhance_contrast(gray)
-        processed_images.append(enhanced)
-        
-        # Version 2: Denoised
-        denoised = self.denoise_image(gray)
-        processed_images.append(denoised)
+        return VariantGraph(self, image)
+    
+    def prepare_regions(self, source: ImageSource) -> List[Tuple[Dict, 'VariantGraph']]:
+        """
+        Detect every IC in a frame and prepare each one for OCR
+        Detection runs on a resized copy while crops are cut from the full-resolution
+        image. Returns (region, graph) pairs, where region holds the rectangle's
+        center, size and angle in original image coordinates. When no tray region
+        is found (e.g. a close-up of a single chip) the frame is prepared as one
+        IC, like prepare() does, with 'whole_frame' set in its region.
+        """
+        with span('load'):
+            image = self.load(source)
+        detection_image = self.resize_image(image)
+        scale = image.shape[1] / detection_image.shape[1]
         
-        # Version 3: Adaptive threshold
-        adaptive_thresh = self.apply_threshold(gray, 'adaptive')
-        processed_images.append(adaptive_thresh)
+        with span('detect_regions'):
+            rects = self.detect_ic_regions(detection_image)
         
-        # Version 4: Otsu threshold
-        otsu_thresh = self.apply_threshold(gray, 'otsu')
-        processed_images.append(otsu_thresh)
+        if not rects:
+            logger.info("No IC regions detected, inspecting the whole frame as one IC")
+            x, y, width, height = self.detect_ic_region(detection_image) or (
+                0, 0, detection_image.shape[1], detection_image.shape[0]
+            )
+            region = {
+                'center': [round((x + width / 2) * scale), round((y + height / 2) * scale)],
+                'size': [round(width * scale), round(height * scale)],
+                'angle': 0.0,
+                'whole_frame': True
+            }
+            crop = self.crop_to_region(detection_image, (x, y, width, height))
+            return [(region, VariantGraph(self, crop))]
         
-        # Version 5: Enhanced + denoised
-        enhanced_denoised = self.denoise_image(enhanced)
-        processed_images.append(enhanced_denoised)
+        prepared = []
+        for rect in rects:
+            (cx, cy), (width, height), angle = self.normalize_rect(rect)
+            rect = ((cx * scale, cy * scale), (width * scale, height * scale), angle)
+            crop = self.resize_image(self.crop_rotated(image, rect))
+            region = {
+                'center': [round(rect[0][0]), round(rect[0][1])],
+                'size': [round(rect[1][0]), round(rect[1][1])],
+                'angle': round(angle, 1)
+            }
+            prepared.append((region, VariantGraph(self, crop)))
+        return prepared
+    
+    def preprocess_for_ocr(self, image_path: ImageSource, auto_detect_ic: bool = True) -> List[np.ndarray]:
+        """
+        Complete preprocessing pipeline for OCR
+        Returns multiple processed versions for better OCR results
+        image_path may also be encoded image bytes or a decoded array
+        """
+        processed_images = self.prepare(image_path, auto_detect_ic).materialize()
         
-        logger.info(f"Generated {len(processed_images)} processed image versions")
+        logger.info("Generated %s processed image versions", len(processed_images))
         return processed_images
     
     def save_image(self, image: np.ndarray, output_path: str):
         """Save processed image to file"""
         cv2.imwrite(output_path, image)
-        logger.info(f"Saved image to: {output_path}")
+        logger.info("Saved image to: %s", output_path)
+
+
+class VariantGraph:
+    """
+    Lazy, memoized graph of preprocessing steps for a single image
+    Each node is computed once, on first request, from the node it depends on;
+    concurrent requests for the same node wait for a single computation
+    """
+    
+    # node -> (input node, ImageProcessor method, extra arguments)
+    STEPS = {
+        'page': ('base', 'convert_to_grayscale', ()),
+        'text': ('page', 'crop_text_regions', ()),
+        'gray': ('text', 'fit_text_height', ()),
+        'clahe': ('gray', 'enhance_contrast', ()),
+        'denoised': ('gray', 'denoise_image', ()),
+        'adaptive': ('gray', 'apply_threshold', ('adaptive',)),
+        'otsu': ('gray', 'apply_threshold', ('otsu',)),
+        'clahe_denoised': ('clahe', 'denoise_image', ()),
+    }
+    
+    def __init__(self, processor: ImageProcessor, base: np.ndarray, localize_text: Optional[bool] = None):
+        self.processor = processor
+        self._nodes = {'base': base}
+        self._locks = {name: threading.Lock() for name in self.STEPS}
+        self.steps = dict(self.STEPS)
+        if not (Config.OCR_TEXT_LOCALIZATION if localize_text is None else localize_text):
+            # Every version is built from the whole grayscale page
+            self.steps['text'] = ('base', 'convert_to_grayscale', ())
+    
+    @property
+    def text_localized(self) -> bool:
+        """Whether the versions are built from stacked text lines rather than the whole page"""
+        text = self.get('text')
+        return self.steps['text'][1] == 'crop_text_regions' and text is not self._nodes.get('page')
+    
+    @property
+    def psm(self) -> Optional[int]:
+        """Tesseract page segmentation mode suited to the versions of this image"""
+        return Config.OCR_LOCALIZED_PSM if self.text_localized else None
+    
+    @property
+    def variant_names(self) -> Tuple[str, ...]:
+        return self.processor.VARIANT_NAMES
+    
+    def is_materialized(self, name: str) -> bool:
+        """Check whether a node has already been computed"""
+        return name in self._nodes
+    
+    def get(self, name: str) -> np.ndarray:
+        """Return a node, computing it and its inputs on first use"""
+        node = self._nodes.get(name)
+        if node is not None:
+            return node
+        if name not in self.steps:
+            raise ValueError(f"Unknown preprocessing variant: {name}")
+        
+        with self._locks[name]:
+            if name not in self._nodes:
+                source, method, args = self.steps[name]
+                source_image = self.get(source)
+                with span(f'preprocess.{name}'):
+                    self._nodes[name] = getattr(self.processor, method)(source_image, *args)
+            return self._nodes[name]
+    
+    def iter_variants(self, order: Optional[List[str]] = None) -> Iterator[Tuple[str, np.ndarray]]:
+        """Yield (name, image) pairs, building each version only when it is reached"""
+        for name in order or self.variant_names:
+            yield name, self.get(name)
+    
+    def materialize(self) -> List[np.ndarray]:
+        """Build every OCR version, in VARIANT_NAMES order"""
+        return [image for _, image in self.iter_variants()]
@@ -1,22 +1,138 @@
-import pytesseract
 import numpy as np
-from typing import Dict, List
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+import hashlib
+import json
 import re
+import threading
+import time
 from config import Config
-from utils import setup_logger
+from utils import setup_logger, REGISTRY, timed
+from .backends import OCRBackend, create_backend
+from .image_processor import ImageProcessor, ImageSource, VariantGraph
+from .variant_scheduler import VariantScheduler
 
 logger = setup_logger(__name__)
 
+OCR_FAILURES = REGISTRY.counter('ic_ocr_failures_total', "OCR calls that raised an error", ['backend'])
+VARIANT_WINS = REGISTRY.counter(
+    'ic_ocr_variant_wins_total', "Preprocessing variant that gave the best OCR result", ['variant']
+)
+VARIANTS_TRIED = REGISTRY.histogram(
+    'ic_ocr_variants_tried', "Variants OCR'd per image before stopping", buckets=(1, 2, 3, 4, 5)
+)
+
+# Engine owned by each worker process when OCR runs on a process pool
+_worker_engine = None
+
+
+def _init_worker(backend_name: str):
+    """Create the per-process OCR engine for process pool workers"""
+    global _worker_engine
+    _worker_engine = OCREngine(parallel=False, backend=backend_name)
+
+
+def _timed_extract_in_worker(image: np.ndarray, psm: Optional[int] = None) -> Dict:
+    """Run timed OCR inside a process pool worker"""
+    return _worker_engine.timed_extract_text(image, psm)
+
+
+def _extract_crop_in_worker(crop: np.ndarray, part_number: Optional[str], oem_name: Optional[str],
+                            profile: Optional[str] = None) -> Dict:
+    """OCR one already cropped IC inside a process pool worker"""
+    variants = VariantGraph(ImageProcessor(profile), crop)
+    return _worker_engine.extract_from_variants(variants, part_number, oem_name)
+
+
+def _extract_path_in_worker(image_path: str, part_number: Optional[str], oem_name: Optional[str],
+                            profile: Optional[str] = None) -> Dict:
+    """Run the full image OCR pipeline inside a process pool worker"""
+    return _worker_engine.extract_from_image_path(image_path, part_number, oem_name, profile)
+
+
 class OCREngine:
-    def __init__(self):
-        pytesseract.pytesseract.tesseract_cmd = Config.TESSERACT_CMD
+    def __init__(self, parallel: Optional[bool] = None, pool_type: Optional[str] = None,
+                 max_workers: Optional[int] = None, backend: Union[str, OCRBackend, None] = None):
+        if isinstance(backend, OCRBackend):
+            self.backend = backend
+        else:
+            self.backend = create_backend(backend)
+        logger.info("Using OCR backend: %s", self.backend.name)
         self.confidence_threshold = Config.OCR_CONFIDENCE_THRESHOLD
+        self.parallel = Config.OCR_PARALLEL if parallel is None else parallel
+        self.pool_type = pool_type or Config.OCR_POOL_TYPE
+        self.max_workers = max_workers or Config.OCR_MAX_WORKERS
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        
+        self.early_exit = Config.OCR_EARLY_EXIT
+        self.early_exit_confidence = Config.OCR_EARLY_EXIT_CONFIDENCE
+        self.first_wave_size = Config.OCR_FIRST_WAVE_SIZE
+        self.scheduler = VariantScheduler(ImageProcessor.VARIANT_NAMES)
+    
+    @property
+    def config_version(self) -> str:
+        """Fingerprint of every setting that affects OCR output, for result caching"""
+        return self.version_for(None)
+    
+    def version_for(self, profile: Optional[str] = None, part_number: Optional[str] = None,
+                    oem_name: Optional[str] = None) -> str:
+        """
+        Fingerprint of the OCR settings with a given preprocessing profile (None for the default)
+        With early exit the result also depends on the claimed part and OEM, which
+        order the variants and decide when to stop, so they are part of it too.
+        """
+        profile = profile or Config.PREPROCESSING_PROFILE
+        settings = {
+            'profile': profile,
+            'profile_settings': ImageProcessor.PROFILES.get(profile),
+            'backend': self.backend.name,
+            'language': Config.OCR_LANGUAGE,
+            'confidence_threshold': self.confidence_threshold,
+            'variants': ImageProcessor.VARIANT_NAMES,
+            'text_localization': Config.OCR_TEXT_LOCALIZATION,
+            'localized_psm': Config.OCR_LOCALIZED_PSM,
+            'early_exit': self.early_exit,
+            'early_exit_confidence': self.early_exit_confidence,
+            'max_width': Config.IMAGE_MAX_WIDTH,
+            'max_height': Config.IMAGE_MAX_HEIGHT
+        }
+        if self.early_exit:
+            settings['target'] = [self._normalize(part_number or ''), self._normalize(oem_name or '')]
+        return hashlib.sha1(json.dumps(settings, sort_keys=True).encode()).hexdigest()
     
-    def extract_text(self, image: np.ndarray) -> Dict:
+    def _get_pool(self):
+        """Create the worker pool on first use and reuse it afterwards"""
+        with self._pool_lock:
+            if self._pool is None:
+                if self.pool_type == 'process':
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=self.max_workers, initializer=_init_worker,
+                        initargs=(self.backend.name,)
+                    )
+                else:
+                    self._pool = ThreadPoolExecutor(
+                        max_workers=self.max_workers, thread_name_prefix='ocr'
+                    )
+                logger.info("Started OCR %s pool with %s workers", self.pool_type, self.max_workers)
+            return self._pool
+    
+    def shutdown(self):
+        """Shut down the worker pool, if one was started, and release the backend"""
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=True)
+                self._pool = None
+                logger.info("OCR pool shut down")
+        self.backend.close()
+    
+    @timed('ocr')
+    def extract_text(self, image: np.ndarray, psm: Optional[int] = None) -> Dict:
         try:
-            data = pytesseract.image_to_data(image, output_type=pytesseract.Output.DICT)
+            data = self.backend.image_to_data(image, psm)
             filtered_text = []
             confidences = []
+            words = []
             
             for i, conf in enumerate(data['conf']):
                 if conf > self.confidence_threshold:
@@ -24,21 +140,196 @@ class OCREngine:
                     if text:
                         filtered_text.append(text)
                         confidences.append(conf)
+                        words.append(self._word(data, i, text, conf))
             
             full_text = ' '.join(filtered_text)
             avg_confidence = sum(confidences) / len(confidences) if confidences else 0
             
-            return {'text': full_text, 'confidence': avg_confidence}
+            return {'text': full_text, 'confidence': avg_confidence, 'words': words}
         except Exception as e:
-            logger.error(f"OCR failed: {e}")
-            return {'text': '', 'confidence': 0}
+            logger.error("OCR failed: %s", e)
+            OCR_FAILURES.inc(backend=self.backend.name)
+            return {'text': '', 'confidence': 0, 'words': []}
     
-    def extract_from_image_path(self, image_path: str) -> Dict:
-        from .image_processor import ImageProcessor
-        processor = ImageProcessor()
-        images = processor.preprocess_for_ocr(image_path)
+    @staticmethod
+    def _word(data: Dict, i: int, text: str, conf: float) -> Dict:
+        """A recognized word with its layout position and bounding box"""
+        def value(key):
+            values = data.get(key)
+            return int(values[i]) if values else 0
         
-        results = [self.extract_text(img) for img in images]
-        best = max(results, key=lambda x: x['confidence'])
-        logger.info(f"OCR complete: {best['confidence']:.2f}% confidence")
+        return {
+            'text': text,
+            'conf': float(conf),
+            'block': value('block_num'),
+            'par': value('par_num'),
+            'line': value('line_num'),
+            'left': value('left'),
+            'top': value('top'),
+            'width': value('width'),
+            'height': value('height')
+        }
+    
+    def timed_extract_text(self, image: np.ndarray, psm: Optional[int] = None) -> Dict:
+        """Run extract_text and record how long it took in seconds"""
+        start = time.perf_counter()
+        result = self.extract_text(image, psm)
+        result['elapsed'] = time.perf_counter() - start
+        return result
+    
+    def _extract_variant(self, variants: VariantGraph, name: str) -> Dict:
+        """Build one version (if needed) and OCR it"""
+        return self.timed_extract_text(variants.get(name), variants.psm)
+    
+    def _extract_variants(self, variants: VariantGraph, names: List[str], parallel: bool) -> List[Dict]:
+        """
+        OCR the named versions, on the worker pool when parallel is set
+        Thread workers build their own versions, so expensive steps also run concurrently
+        """
+        if not parallel or len(names) < 2:
+            return [self._extract_variant(variants, name) for name in names]
+        
+        pool = self._get_pool()
+        if self.pool_type == 'process':
+            images = [variants.get(name) for name in names]
+            futures = [pool.submit(_timed_extract_in_worker, img, variants.psm) for img in images]
+        else:
+            futures = [pool.submit(self._extract_variant, variants, name) for name in names]
+        # Collect in submission order so ties resolve the same way as sequential mode
+        return [future.result() for future in futures]
+    
+    @staticmethod
+    def _normalize(text: str) -> str:
+        """Uppercase and strip everything but letters and digits"""
+        return re.sub(r'[^A-Z0-9]', '', text.upper())
+    
+    def _target_reached(self, result: Dict, expected_text: Optional[str]) -> bool:
+        """Check whether a variant result is good enough to stop trying others"""
+        if result['confidence'] >= self.early_exit_confidence:
+            return True
+        if expected_text and result['confidence'] >= self.confidence_threshold:
+            expected = self._normalize(expected_text)
+            return bool(expected) and expected in self._normalize(result['text'])
+        return False
+    
+    def extract_from_image_path(self, image_path: str, part_number: Optional[str] = None,
+                                oem_name: Optional[str] = None, profile: Optional[str] = None) -> Dict:
+        """OCR an image file and return the best result"""
+        return self.extract_from_image(image_path, part_number, oem_name, profile)
+    
+    def extract_from_image(self, image: ImageSource, part_number: Optional[str] = None,
+                           oem_name: Optional[str] = None, profile: Optional[str] = None) -> Dict:
+        """
+        OCR the preprocessed versions of an image and return the best result
+        image may be a file path, encoded image bytes or a decoded array.
+        With early exit enabled, versions are built and OCR'd lazily in the order
+        that has worked best for this part/OEM, stopping once a target is reached.
+        profile selects a preprocessing profile instead of Config.PREPROCESSING_PROFILE
+        """
+        variants = ImageProcessor(profile).prepare(image)
+        return self.extract_from_variants(variants, part_number, oem_name, self.parallel)
+    
+    def extract_from_variants(self, variants: VariantGraph, part_number: Optional[str] = None,
+                              oem_name: Optional[str] = None, parallel: bool = False) -> Dict:
+        """OCR the versions of an already prepared image and return the best result"""
+        if self.early_exit:
+            order = self.scheduler.order(part_number, oem_name)
+            wave_size = self.first_wave_size
+        else:
+            order = list(ImageProcessor.VARIANT_NAMES)
+            wave_size = len(order)
+        
+        start = time.perf_counter()
+        names, results = [], []
+        pending = list(order)
+        while pending:
+            wave, pending = pending[:wave_size], pending[wave_size:]
+            wave_results = self._extract_variants(variants, wave, parallel)
+            names.extend(wave)
+            results.extend(wave_results)
+            
+            if self.early_exit and any(self._target_reached(r, part_number) for r in wave_results):
+                break
+            wave_size = self.max_workers if parallel else 1
+        elapsed = time.perf_counter() - start
+        
+        timings = {name: result.pop('elapsed') for name, result in zip(names, results)}
+        best_index = max(range(len(results)), key=lambda i: results[i]['confidence'])
+        best = results[best_index]
+        best['variant'] = names[best_index]
+        best['variants_tried'] = names
+        best['variant_timings'] = timings
+        best['ocr_time'] = elapsed
+        VARIANT_WINS.inc(variant=best['variant'])
+        VARIANTS_TRIED.observe(len(names))
+        
+        if self.early_exit and best['confidence'] > 0:
+            self.scheduler.record_win(best['variant'], part_number, oem_name)
+        
+        logger.info("OCR complete: %.2f%% confidence (variant: %s, %s tried, %.2fs)",
+                    best['confidence'], best['variant'], len(names), elapsed)
         return best
+    
+    def extract_from_regions(self, image: ImageSource, part_number: Optional[str] = None,
+                             oem_name: Optional[str] = None, profile: Optional[str] = None) -> List[Dict]:
+        """
+        Detect every IC in a frame (e.g. a tray) and OCR each one
+        In parallel mode each crop is one pool task that tries its versions
+        sequentially, so pool workers never wait on tasks queued behind them.
+        
+        Returns:
+            One OCR result per detected IC, in reading order, each with its 'region'
+        """
+        prepared = ImageProcessor(profile).prepare_regions(image)
+        if not self.parallel or len(prepared) < 2:
+            results = [
+                self.extract_from_variants(variants, part_number, oem_name, self.parallel)
+                for _, variants in prepared
+            ]
+        else:
+            pool = self._get_pool()
+            if self.pool_type == 'process':
+                futures = [
+                    pool.submit(_extract_crop_in_worker, variants.get('base'), part_number, oem_name, profile)
+                    for _, variants in prepared
+                ]
+            else:
+                futures = [
+                    pool.submit(self.extract_from_variants, variants, part_number, oem_name)
+                    for _, variants in prepared
+                ]
+            results = [future.result() for future in futures]
+        
+        for (region, _), result in zip(prepared, results):
+            result['region'] = region
+        logger.info("OCR'd %s IC regions", len(results))
+        return results
+    
+    def extract_many(self, items: List[Tuple[str, Optional[str], Optional[str]]],
+                     max_workers: Optional[int] = None,
+                     profile: Optional[str] = None) -> Iterator[Tuple[int, Union[Dict, Exception]]]:
+        """
+        OCR many (image_path, part_number, oem_name) items across worker processes
+        Yields (index, result) as each image finishes; a failed image yields its exception
+        """
+        max_workers = max_workers or Config.BATCH_MAX_WORKERS
+        if max_workers <= 1:
+            for index, item in enumerate(items):
+                try:
+                    yield index, self.extract_from_image_path(*item, profile)
+                except Exception as e:
+                    yield index, e
+            return
+        
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                                 initargs=(self.backend.name,)) as pool:
+            futures = {
+                pool.submit(_extract_path_in_worker, *item, profile): index
+                for index, item in enumerate(items)
+            }
+            logger.info("Batch OCR started: %s images on %s processes", len(items), max_workers)
+            for future in as_completed(futures):
+                try:
+                    yield futures[future], future.result()
+                except Exception as e:
+                    yield futures[future], e
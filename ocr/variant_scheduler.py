@@ -0,0 +1,49 @@
+from collections import Counter, defaultdict
+from typing import List, Optional, Sequence
+import threading
+
+from utils import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class VariantScheduler:
+    """Learns which preprocessing variant wins most often per part number or OEM"""
+    
+    def __init__(self, variant_names: Sequence[str]):
+        self.variant_names = tuple(variant_names)
+        self._wins = defaultdict(Counter)
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def _keys(part_number: Optional[str], oem_name: Optional[str]) -> List[tuple]:
+        """Statistics keys from most to least specific"""
+        keys = []
+        if part_number:
+            keys.append(('part', part_number.strip().upper()))
+        if oem_name:
+            keys.append(('oem', oem_name.strip().upper()))
+        keys.append(('all',))
+        return keys
+    
+    def order(self, part_number: Optional[str] = None, oem_name: Optional[str] = None) -> List[str]:
+        """Return variant names ordered by win count for the most specific known key"""
+        with self._lock:
+            for key in self._keys(part_number, oem_name):
+                wins = self._wins.get(key)
+                if wins:
+                    # Stable sort keeps the default order between equally ranked variants
+                    return sorted(self.variant_names, key=lambda name: -wins[name])
+        return list(self.variant_names)
+    
+    def record_win(self, variant: str, part_number: Optional[str] = None, oem_name: Optional[str] = None):
+        """Count a win for variant under the part, OEM and global keys"""
+        with self._lock:
+            for key in self._keys(part_number, oem_name):
+                self._wins[key][variant] += 1
+        logger.debug("Recorded variant win: %s (%s, %s)", variant, part_number, oem_name)
+    
+    def stats(self) -> dict:
+        """Snapshot of win counts keyed by a readable label"""
+        with self._lock:
+            return {':'.join(key): dict(wins) for key, wins in self._wins.items()}
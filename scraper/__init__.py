@@ -1,3 +1,4 @@
 from .datasheet_scraper import DatasheetScraper
+from .reference_cache import ReferenceCache
 
-__all__ = ['DatasheetScraper']
+__all__ = ['DatasheetScraper', 'ReferenceCache']
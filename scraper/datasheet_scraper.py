@@ -1,22 +1,111 @@
+import asyncio
+import random
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urlsplit
+
 import requests
 from bs4 import BeautifulSoup
-from typing import Dict, Optional
+from requests.adapters import HTTPAdapter
 from config import Config
-from utils import setup_logger
+from utils import setup_logger, REGISTRY, span
 
 logger = setup_logger(__name__)
 
+SEARCHES = REGISTRY.counter(
+    'ic_scraper_searches_total', "Datasheet searches by outcome (found, not_found, error)", ['outcome']
+)
+RETRIES = REGISTRY.counter(
+    'ic_scraper_retries_total', "HTTP requests retried by the scraper, by reason", ['reason']
+)
+
+# Responses worth another attempt: rate limited or a transient server error
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class HostRateLimiter:
+    """Space out requests to each host so they start at most `rate` times per second"""
+    
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next_slot = {}  # host -> earliest monotonic time of the next request
+        self._lock = threading.Lock()
+    
+    def wait(self, host: str):
+        """Block until the caller may send a request to host"""
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, 0.0))
+            self._next_slot[host] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
 class DatasheetScraper:
-    def __init__(self):
+    """
+    Looks up datasheets through a web search
+    Requests go through one keep-alive session, are rate limited per host and
+    retried with jittered exponential backoff on connection errors, timeouts,
+    429 and 5xx responses.
+    """
+    
+    def __init__(self, search_url: Optional[str] = None, max_retries: Optional[int] = None,
+                 rate_limit: Optional[float] = None, backoff_base: Optional[float] = None):
         self.timeout = Config.SCRAPER_TIMEOUT
         self.headers = {'User-Agent': Config.USER_AGENT}
+        self.search_url = search_url or Config.SCRAPER_SEARCH_URL
+        self.max_retries = max_retries if max_retries is not None else Config.MAX_RETRIES
+        self.backoff_base = backoff_base if backoff_base is not None else Config.RETRY_BACKOFF_BASE
+        self.rate_limiter = HostRateLimiter(rate_limit if rate_limit is not None else Config.SCRAPER_RATE_LIMIT)
+        
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        # Retries are handled in _get so they share the backoff and rate limit
+        adapter = HTTPAdapter(pool_connections=Config.SCRAPER_POOL_SIZE,
+                              pool_maxsize=Config.SCRAPER_POOL_SIZE, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+    
+    def _backoff(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """Delay before retry number attempt + 1: a server Retry-After, else full jitter"""
+        if retry_after:
+            try:
+                return min(float(retry_after), Config.RETRY_BACKOFF_MAX)
+            except ValueError:
+                pass  # HTTP-date form, fall back to backoff
+        return random.uniform(0, min(Config.RETRY_BACKOFF_MAX, self.backoff_base * 2 ** attempt))
+    
+    def _get(self, url: str, params: Optional[Dict] = None) -> requests.Response:
+        """GET with the pooled session, retrying transient failures up to self.max_retries times"""
+        host = urlsplit(url).netloc
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.wait(host)
+            try:
+                with span('scrape'):
+                    response = self.session.get(url, params=params, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt == self.max_retries:
+                    raise
+                reason, delay = type(e).__name__, self._backoff(attempt)
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                    response.raise_for_status()
+                    return response
+                reason = str(response.status_code)
+                delay = self._backoff(attempt, response.headers.get('Retry-After'))
+                response.close()
+            
+            RETRIES.inc(reason=reason)
+            logger.warning("Request to %s failed (%s), retrying in %.2fs", host, reason, delay)
+            time.sleep(delay)
     
     def search_datasheet(self, part_number: str, oem_name: str) -> Optional[str]:
         """Search for datasheet URL"""
         try:
-            query = f"{part_number} {oem_name} datasheet"
-            search_url = f"https://www.google.com/search?q={query}"
-            response = requests.get(search_url, headers=self.headers, timeout=self.timeout)
+            response = self._get(self.search_url, params={'q': f"{part_number} {oem_name} datasheet"})
             
             soup = BeautifulSoup(response.text, 'html.parser')
             links = soup.find_all('a', href=True)
@@ -24,12 +113,15 @@ class DatasheetScraper:
             for link in links:
                 href = link['href']
                 if 'pdf' in href.lower() or 'datasheet' in href.lower():
-                    logger.info(f"Found datasheet: {href}")
+                    logger.info("Found datasheet: %s", href)
+                    SEARCHES.inc(outcome='found')
                     return href
             
+            SEARCHES.inc(outcome='not_found')
             return None
         except Exception as e:
-            logger.error(f"Datasheet search failed: {e}")
+            logger.error("Datasheet search failed: %s", e)
+            SEARCHES.inc(outcome='error')
             return None
     
     def extract_marking_info(self, part_number: str, oem_name: str) -> Dict:
@@ -43,3 +135,30 @@ class DatasheetScraper:
             'marking_patterns': [part_number, oem_name[:3].upper()],
             'date_code_format': 'YYWW'
         }
+    
+    async def extract_many_async(self, pairs: Sequence[Tuple[str, str]],
+                                 max_concurrency: Optional[int] = None) -> List[Dict]:
+        """
+        Extract marking information for many (part number, OEM name) pairs concurrently
+        Lookups run on worker threads sharing the pooled session, at most
+        max_concurrency (default Config.SCRAPER_MAX_CONCURRENCY) at a time.
+        
+        Returns:
+            One marking info dict per pair, in order
+        """
+        semaphore = asyncio.Semaphore(max_concurrency or Config.SCRAPER_MAX_CONCURRENCY)
+        
+        async def extract(part_number: str, oem_name: str) -> Dict:
+            async with semaphore:
+                return await asyncio.to_thread(self.extract_marking_info, part_number, oem_name)
+        
+        return list(await asyncio.gather(*(extract(*pair) for pair in pairs)))
+    
+    def extract_many(self, pairs: Sequence[Tuple[str, str]],
+                     max_concurrency: Optional[int] = None) -> List[Dict]:
+        """Blocking form of extract_many_async, for callers outside an event loop"""
+        return asyncio.run(self.extract_many_async(pairs, max_concurrency))
+    
+    def close(self):
+        """Close the pooled connections"""
+        self.session.close()
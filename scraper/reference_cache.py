@@ -0,0 +1,157 @@
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Optional, Sequence, Tuple
+import copy
+import json
+import threading
+import time
+
+from config import Config
+from utils import setup_logger, REGISTRY
+
+logger = setup_logger(__name__)
+
+LOOKUPS = REGISTRY.counter(
+    'ic_reference_cache_total',
+    "Reference lookups by result (memory_hits, negative_hits, db_hits, fetches, coalesced)",
+    ['result']
+)
+
+
+class ReferenceCache:
+    """
+    Read-through cache for IC reference marking data
+    An in-process LRU with TTL sits in front of the DatasheetCache table, which
+    sits in front of the web scraper. Failed lookups are cached for a shorter
+    time and concurrent requests for the same part share a single fetch.
+    """
+    
+    def __init__(self, scraper, db_manager, max_entries: Optional[int] = None,
+                 ttl: Optional[float] = None, negative_ttl: Optional[float] = None,
+                 max_age_days: Optional[int] = None):
+        self.scraper = scraper
+        self.db_manager = db_manager
+        self.max_entries = max_entries or Config.REFERENCE_CACHE_SIZE
+        self.ttl = ttl if ttl is not None else Config.REFERENCE_CACHE_TTL
+        self.negative_ttl = negative_ttl if negative_ttl is not None else Config.REFERENCE_NEGATIVE_TTL
+        self.max_age_days = max_age_days if max_age_days is not None else Config.REFERENCE_CACHE_MAX_AGE_DAYS
+        
+        self._entries = OrderedDict()  # key -> (expires_at, reference)
+        self._inflight = {}  # key -> Future shared by concurrent callers
+        self._lock = threading.Lock()
+        self._stats = {'memory_hits': 0, 'db_hits': 0, 'fetches': 0, 'negative_hits': 0, 'coalesced': 0}
+    
+    @staticmethod
+    def _key(part_number: str, oem_name: str) -> Tuple[str, str]:
+        return part_number.strip().upper(), oem_name.strip().upper()
+    
+    def get(self, part_number: str, oem_name: str) -> Dict:
+        """Return reference data for a part, fetching it at most once across concurrent callers"""
+        key = self._key(part_number, oem_name)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, reference = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self._count('negative_hits' if not reference.get('datasheet_url') else 'memory_hits')
+                    return copy.deepcopy(reference)
+                del self._entries[key]
+            
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+            else:
+                self._count('coalesced')
+        
+        if not leader:
+            return copy.deepcopy(future.result())
+        
+        try:
+            reference, ttl = self._load(part_number, oem_name)
+            self._store(key, reference, ttl)
+            future.set_result(reference)
+            return copy.deepcopy(reference)
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+    
+    def get_many(self, pairs: Sequence[Tuple[str, str]],
+                 max_concurrency: Optional[int] = None) -> Dict[Tuple[str, str], Dict]:
+        """
+        Return reference data for many (part number, OEM name) pairs
+        Each unique pair is looked up once; misses are fetched concurrently, at most
+        max_concurrency (default Config.SCRAPER_MAX_CONCURRENCY) at a time.
+        """
+        unique = list(dict.fromkeys(pairs))
+        if len(unique) <= 1:
+            return {pair: self.get(*pair) for pair in unique}
+        
+        workers = min(max_concurrency or Config.SCRAPER_MAX_CONCURRENCY, len(unique))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='reference') as pool:
+            return dict(zip(unique, pool.map(lambda pair: self.get(*pair), unique)))
+    
+    def _count(self, result: str):
+        """Count a lookup result (called with the lock held)"""
+        self._stats[result] += 1
+        LOOKUPS.inc(result=result)
+    
+    def _load(self, part_number: str, oem_name: str) -> Tuple[Dict, float]:
+        """Load reference data from the database cache, or scrape it on a miss"""
+        db_part_number = part_number.strip().upper()
+        try:
+            cached = self.db_manager.get_cached_datasheet(db_part_number, self.max_age_days)
+            if cached and cached.marking_info and cached.oem_name.strip().upper() == oem_name.strip().upper():
+                reference = json.loads(cached.marking_info)
+                if reference:
+                    with self._lock:
+                        self._count('db_hits')
+                    return reference, self.ttl
+        except Exception as e:
+            logger.warning("Reference cache read failed for %s: %s", part_number, e)
+        
+        with self._lock:
+            self._count('fetches')
+        reference = self.scraper.extract_marking_info(part_number, oem_name)
+        
+        if not reference.get('datasheet_url'):
+            # Keep the fallback reference briefly, but don't persist it
+            logger.info("Reference lookup failed for %s, caching for %ss", part_number, self.negative_ttl)
+            return reference, self.negative_ttl
+        
+        try:
+            self.db_manager.save_datasheet_cache({
+                'part_number': db_part_number,
+                'oem_name': oem_name,
+                'datasheet_url': reference.get('datasheet_url'),
+                'marking_info': reference
+            })
+        except Exception as e:
+            logger.warning("Reference cache write failed for %s: %s", part_number, e)
+        return reference, self.ttl
+    
+    def _store(self, key: Tuple[str, str], reference: Dict, ttl: float):
+        """Insert an entry, evicting the least recently used ones over capacity"""
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, reference)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def invalidate(self, part_number: str):
+        """Drop a part from both cache tiers"""
+        part_key = part_number.strip().upper()
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == part_key]:
+                del self._entries[key]
+        self.db_manager.invalidate_cache(part_key)
+    
+    def stats(self) -> Dict:
+        """Hit/miss counters and current size"""
+        with self._lock:
+            return dict(self._stats, size=len(self._entries))
@@ -61,6 +61,84 @@ def test_database():
         print(f"✗ Database test failed: {e}")
         return False
 
+def test_database_concurrency():
+    """Test that history reads keep flowing during heavy inspection writes"""
+    print("\n" + "=" * 60)
+    print("Testing Database Concurrency...")
+    print("=" * 60)
+    
+    import tempfile
+    import threading
+    import time
+    
+    workdir = tempfile.mkdtemp(prefix='ic-stress-')
+    try:
+        from database import DatabaseManager
+        
+        db = DatabaseManager(f"sqlite:///{os.path.join(workdir, 'stress.db')}")
+        with db.engine.connect() as connection:
+            journal_mode = connection.exec_driver_sql("PRAGMA journal_mode").scalar()
+        assert journal_mode.lower() == 'wal', f"journal mode is {journal_mode}"
+        print(f"✓ Journal mode: {journal_mode}")
+        
+        record = {
+            'image_path': 'stress.jpg',
+            'part_number': 'LM358',
+            'oem_name': 'Texas Instruments',
+            'extracted_text': 'LM358 TI 2231' * 20,
+            'ocr_confidence': 90.0,
+            'status': 'GENUINE',
+            'confidence': 0.95,
+            'differences': [],
+            'reference_markings': {'marking_patterns': ['LM358', 'TI'] * 50}
+        }
+        stop = threading.Event()
+        written = [0]
+        read_latencies = []
+        errors = []
+        
+        def write():
+            # Several writers bypassing the buffered writer, as separate workers would
+            while not stop.is_set():
+                try:
+                    written[0] += len(db.insert_inspections([record] * 50))
+                except Exception as e:
+                    errors.append(e)
+        
+        def read():
+            while not stop.is_set():
+                start = time.perf_counter()
+                try:
+                    db.get_inspection_history(limit=20)
+                except Exception as e:
+                    errors.append(e)
+                read_latencies.append(time.perf_counter() - start)
+        
+        threads = [threading.Thread(target=write) for _ in range(4)] + \
+                  [threading.Thread(target=read) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        time.sleep(3)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        db.close()
+        
+        read_latencies.sort()
+        p99 = read_latencies[int(len(read_latencies) * 0.99)]
+        print(f"✓ {written[0]} records written, {len(read_latencies)} history reads in 3s")
+        print(f"  Read latency p99: {p99 * 1000:.1f} ms, max: {read_latencies[-1] * 1000:.1f} ms")
+        assert not errors, f"{len(errors)} errors, first: {errors[0]!r}"
+        assert read_latencies[-1] < 1.0, "history reads stalled behind writes"
+        
+        return True
+    except Exception as e:
+        print(f"✗ Database concurrency test failed: {e}")
+        return False
+    finally:
+        import shutil
+        shutil.rmtree(workdir, ignore_errors=True)
+
 def test_ocr():
     """Test OCR engine"""
     print("\n" + "=" * 60)
@@ -106,6 +184,89 @@ def test_scraper():
         print(f"✗ Scraper test failed: {e}")
         return False
 
+def test_scraper_pooling():
+    """Test scraper connection reuse, retries and concurrency against a local server"""
+    print("\n" + "=" * 60)
+    print("Testing Scraper Pooling...")
+    print("=" * 60)
+    
+    import threading
+    import time
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from urllib.parse import parse_qs, urlsplit
+    
+    state = {'connections': set(), 'active': 0, 'max_active': 0, 'flaky_hits': 0}
+    lock = threading.Lock()
+    
+    class SearchHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'  # keep-alive
+        
+        def do_GET(self):
+            query = parse_qs(urlsplit(self.path).query).get('q', [''])[0]
+            part_number = query.split()[0]
+            with lock:
+                state['connections'].add(self.client_address)
+                state['active'] += 1
+                state['max_active'] = max(state['max_active'], state['active'])
+                flaky = part_number == 'FLAKY' and state['flaky_hits'] == 0
+                if part_number == 'FLAKY':
+                    state['flaky_hits'] += 1
+            time.sleep(0.05)
+            
+            body = f'<a href="/datasheets/{part_number}.pdf">{part_number}</a>'.encode()
+            self.send_response(503 if flaky else 200)
+            if flaky:
+                self.send_header('Retry-After', '0')
+            self.send_header('Content-Type', 'text/html')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            with lock:
+                state['active'] -= 1
+        
+        def log_message(self, *args):
+            pass
+    
+    server = ThreadingHTTPServer(('127.0.0.1', 0), SearchHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    
+    try:
+        from scraper import DatasheetScraper
+        
+        scraper = DatasheetScraper(search_url=f"http://127.0.0.1:{server.server_port}/search",
+                                   rate_limit=0, backoff_base=0.01)
+        
+        # Sequential searches share one keep-alive connection
+        for _ in range(5):
+            assert scraper.search_datasheet("LM358", "Texas Instruments") == "/datasheets/LM358.pdf"
+        assert len(state['connections']) == 1, f"{len(state['connections'])} connections opened"
+        print("✓ Sequential searches reused 1 connection")
+        
+        # A 503 is retried
+        assert scraper.search_datasheet("FLAKY", "Texas Instruments") == "/datasheets/FLAKY.pdf"
+        assert state['flaky_hits'] == 2
+        print("✓ Transient 503 retried")
+        
+        # A lot of parts resolves concurrently, in order
+        pairs = [(f"PART{i}", "Texas Instruments") for i in range(8)]
+        start = time.perf_counter()
+        results = scraper.extract_many(pairs, max_concurrency=4)
+        elapsed = time.perf_counter() - start
+        assert [r['datasheet_url'] for r in results] == [f"/datasheets/PART{i}.pdf" for i in range(8)]
+        assert state['max_active'] > 1, "requests never overlapped"
+        assert len(state['connections']) <= 4, f"{len(state['connections'])} connections opened"
+        print(f"✓ Resolved {len(pairs)} parts in {elapsed:.2f}s "
+              f"({state['max_active']} concurrent, {len(state['connections'])} connections)")
+        
+        scraper.close()
+        return True
+    except Exception as e:
+        print(f"✗ Scraper pooling test failed: {e!r}")
+        return False
+    finally:
+        server.shutdown()
+        server.server_close()
+
 def test_verifier():
     """Test marking verifier"""
     print("\n" + "=" * 60)
@@ -136,6 +297,82 @@ def test_verifier():
         print(f"✗ Verifier test failed: {e}")
         return False
 
+def test_marking_alignment():
+    """Test that fields only match whole part numbers and date code tokens"""
+    print("\n" + "=" * 60)
+    print("Testing Marking Alignment...")
+    print("=" * 60)
+    
+    try:
+        from verification import MarkingVerifier
+        
+        verifier = MarkingVerifier()
+        
+        def reference(part_number):
+            return {'part_number': part_number, 'oem_name': 'Texas Instruments',
+                    'marking_patterns': [part_number, 'TI'], 'date_code_format': 'YYWW'}
+        
+        # A package suffix is allowed, the rest of a longer part number is not
+        assert verifier.verify_marking("TI LM358P 2214", reference('LM358'))['confidence'] == 1.0
+        result = verifier.verify_marking("TI LM358P 2214", reference('LM35'))
+        assert result['confidence'] < 1.0 and result['status'] != 'GENUINE', result
+        result = verifier.verify_marking("TI LM3580000000 2214", reference('LM358'))
+        assert result['field_scores']['part']['score'] < 1.0, result
+        print("✓ Claimed LM35 on an LM358 marking and LM358 on LM3580000000 are not full matches")
+        
+        # The digits of the part number are not a date code
+        for part_number in ('LM2904', 'LM7805', 'NE5532'):
+            result = verifier.verify_marking(f"TI {part_number}", reference(part_number))
+            assert result['field_scores']['date_code']['matched'] is None, result
+            assert "Date code not found" in result['differences'], result
+        result = verifier.verify_marking("TI LM2904 2214", reference('LM2904'))
+        assert result['field_scores']['date_code']['matched'] == '2214', result
+        print("✓ Date code is only read from its own token")
+        
+        return True
+    except Exception as e:
+        print(f"✗ Marking alignment test failed: {e!r}")
+        return False
+
+def test_text_localization():
+    """Test that marking lines are localized whole at several camera resolutions"""
+    print("\n" + "=" * 60)
+    print("Testing Text Localization...")
+    print("=" * 60)
+    
+    try:
+        import cv2
+        import numpy as np
+        from benchmarks.synthetic import render_marking
+        from ocr import ImageProcessor
+        
+        processor = ImageProcessor()
+        lines = ['LM358N', 'TI 2214']
+        for size in [(640, 480), (1280, 960), (2592, 1944)]:
+            image, blank = render_marking(lines, size), render_marking([' '], size)
+            gray = processor.convert_to_grayscale(processor.resize_image(image))
+            text = gray.astype(int) - processor.convert_to_grayscale(processor.resize_image(blank)) > 40
+            
+            boxes = processor.localize_text(gray)
+            inside = np.zeros_like(text)
+            for x, y, w, h in boxes:
+                inside[y:y + h, x:x + w] = True
+            coverage = (text & inside).sum() / text.sum()
+            stacked = processor.crop_text_regions(gray)
+            assert len(boxes) == len(lines) and coverage > 0.95, (size, boxes, coverage)
+            print(f"✓ {size[0]}x{size[1]}: {len(boxes)} lines, {coverage:.1%} of the text kept, "
+                  f"stacked {stacked.shape[1]}x{stacked.shape[0]}")
+        
+        # Nothing to localize: the whole image is used
+        empty = np.full((480, 640), 35, dtype=np.uint8)
+        assert processor.crop_text_regions(empty) is empty
+        print("✓ Blank image falls back to the full image")
+        
+        return True
+    except Exception as e:
+        print(f"✗ Text localization test failed: {e!r}")
+        return False
+
 def test_config():
     """Test configuration"""
     print("\n" + "=" * 60)
@@ -183,9 +420,13 @@ def main():
         'Configuration': test_config(),
         'System Initialization': test_system_initialization() is not None,
         'Database': test_database(),
+        'Database Concurrency': test_database_concurrency(),
         'OCR Engine': test_ocr(),
         'Web Scraper': test_scraper(),
-        'Verifier': test_verifier()
+        'Scraper Pooling': test_scraper_pooling(),
+        'Verifier': test_verifier(),
+        'Marking Alignment': test_marking_alignment(),
+        'Text Localization': test_text_localization()
     }
     
     # Summary
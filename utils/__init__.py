@@ -1,3 +1,11 @@
 from .logger import setup_logger
+from .content_store import content_address, read_addressed, write_if_missing
+from .executor import BoundedExecutor, ExecutorSaturatedError
+from .job_queue import Job, JobQueue
+from .metrics import REGISTRY, Counter, Gauge, Histogram, MetricsRegistry, span, timed
 
-__all__ = ['setup_logger']
+__all__ = [
+    'setup_logger', 'content_address', 'read_addressed', 'write_if_missing',
+    'BoundedExecutor', 'ExecutorSaturatedError', 'Job', 'JobQueue',
+    'REGISTRY', 'Counter', 'Gauge', 'Histogram', 'MetricsRegistry', 'span', 'timed'
+]
@@ -0,0 +1,54 @@
+import hashlib
+import os
+import tempfile
+from typing import BinaryIO, Tuple
+
+from .logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Bytes read from an upload stream per digest update
+READ_CHUNK_SIZE = 1 << 20
+
+
+def _address(content_hash: str, folder: str, filename: str) -> Tuple[str, str]:
+    extension = os.path.splitext(filename)[1].lower()
+    return os.path.join(folder, content_hash + extension), content_hash
+
+
+def content_address(data: bytes, folder: str, filename: str = '') -> Tuple[str, str]:
+    """Return the content-addressed (file path, hex digest) for in-memory data without writing it"""
+    return _address(hashlib.sha256(data).hexdigest(), folder, filename)
+
+
+def read_addressed(stream: BinaryIO, folder: str, filename: str = '') -> Tuple[bytes, str, str]:
+    """
+    Read a stream into memory, hashing each chunk as it arrives
+    
+    Returns:
+        (data, content-addressed file path, hex digest); nothing is written
+    """
+    digest = hashlib.sha256()
+    chunks = []
+    for chunk in iter(lambda: stream.read(READ_CHUNK_SIZE), b''):
+        digest.update(chunk)
+        chunks.append(chunk)
+    return (b''.join(chunks),) + _address(digest.hexdigest(), folder, filename)
+
+
+def write_if_missing(path: str, data: bytes) -> bool:
+    """Atomically write data to path unless it already exists; returns whether it was written"""
+    if os.path.exists(path):
+        return False
+    
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', prefix='.upload-', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            out.write(data)
+        os.replace(tmp_path, path)
+        logger.debug("Persisted %s", path)
+        return True
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
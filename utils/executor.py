@@ -0,0 +1,64 @@
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable
+
+from .logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class ExecutorSaturatedError(RuntimeError):
+    """Raised when a BoundedExecutor has no free worker or queue slot"""
+    pass
+
+
+class BoundedExecutor:
+    """
+    Thread pool that caps running plus queued tasks
+    Submitting beyond the cap fails fast with ExecutorSaturatedError instead of
+    letting an unbounded backlog build up
+    """
+    
+    def __init__(self, max_workers: int, max_queued: int = 0, name: str = 'worker'):
+        self.max_workers = max_workers
+        self.capacity = max_workers + max_queued
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._slots = threading.BoundedSemaphore(self.capacity)
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self.name = name
+    
+    def _release(self, _future: Future):
+        with self._lock:
+            self._in_flight -= 1
+        self._slots.release()
+    
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        """Submit a task, raising ExecutorSaturatedError when the executor is full"""
+        if not self._slots.acquire(blocking=False):
+            logger.warning("%s executor saturated (%s tasks in flight)", self.name, self.capacity)
+            raise ExecutorSaturatedError(f"{self.name} executor is at capacity")
+        
+        with self._lock:
+            self._in_flight += 1
+        try:
+            future = self._executor.submit(fn, *args, **kwargs)
+        except Exception:
+            self._release(None)
+            raise
+        future.add_done_callback(self._release)
+        return future
+    
+    async def run(self, fn: Callable, *args, **kwargs):
+        """Run a blocking callable on the executor and await its result"""
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+    
+    @property
+    def in_flight(self) -> int:
+        """Number of tasks running or waiting for a worker"""
+        with self._lock:
+            return self._in_flight
+    
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,135 @@
+import queue
+import threading
+import uuid
+from concurrent.futures import Future, wait
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional
+
+from .executor import ExecutorSaturatedError
+from .logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class Job:
+    """A unit of work tracked by JobQueue"""
+    
+    def __init__(self, fn: Callable, args: tuple, kwargs: dict):
+        self.id = uuid.uuid4().hex
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.status = 'queued'  # queued, running, completed, failed
+        self.result = None
+        self.error = None
+        self.created_at = datetime.utcnow()
+        self.started_at = None
+        self.finished_at = None
+        # Resolves to None once the job has finished; marked running up front so
+        # that cancelling a waiter (e.g. asyncio.wrap_future) can't cancel it
+        self.future = Future()
+        self.future.set_running_or_notify_cancel()
+    
+    @property
+    def done(self) -> bool:
+        return self.future.done()
+    
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until the job finishes or timeout expires; returns whether it finished"""
+        wait([self.future], timeout)
+        return self.done
+    
+    def to_dict(self) -> Dict:
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'created_at': self.created_at.isoformat(),
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'result': self.result,
+            'error': self.error
+        }
+
+
+class JobQueue:
+    """
+    In-process job queue served by a fixed pool of worker threads
+    Intake only enqueues, so callers get a job id immediately; finished jobs are
+    kept for result_ttl seconds so clients can collect their results
+    """
+    
+    def __init__(self, num_workers: int, max_pending: int, result_ttl: float, name: str = 'jobs'):
+        self.name = name
+        self.result_ttl = result_ttl
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._workers = [
+            threading.Thread(target=self._work, name=f"{name}_{i}", daemon=True)
+            for i in range(num_workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+        logger.info("Started %s queue with %s workers", name, num_workers)
+    
+    def submit(self, fn: Callable, *args, **kwargs) -> Job:
+        """Enqueue a job, raising ExecutorSaturatedError when the queue is full"""
+        self._evict_expired()
+        job = Job(fn, args, kwargs)
+        with self._lock:
+            self._jobs[job.id] = job
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            with self._lock:
+                del self._jobs[job.id]
+            logger.warning("%s queue full (%s pending)", self.name, self._queue.maxsize)
+            raise ExecutorSaturatedError(f"{self.name} queue is full")
+        return job
+    
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+    
+    @property
+    def pending(self) -> int:
+        """Number of jobs waiting for a worker"""
+        return self._queue.qsize()
+    
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                break
+            job.status = 'running'
+            job.started_at = datetime.utcnow()
+            try:
+                job.result = job.fn(*job.args, **job.kwargs)
+                job.status = 'completed'
+            except Exception as e:
+                logger.error("Job %s failed: %s", job.id, e)
+                job.error = str(e)
+                job.status = 'failed'
+            finally:
+                job.finished_at = datetime.utcnow()
+                job.fn = job.args = job.kwargs = None
+                job.future.set_result(None)
+    
+    def _evict_expired(self):
+        """Forget finished jobs older than result_ttl"""
+        cutoff = datetime.utcnow() - timedelta(seconds=self.result_ttl)
+        with self._lock:
+            expired = [
+                job_id for job_id, job in self._jobs.items()
+                if job.done and job.finished_at < cutoff
+            ]
+            for job_id in expired:
+                del self._jobs[job_id]
+    
+    def shutdown(self, wait: bool = True):
+        """Stop the workers after the jobs already queued have run"""
+        for _ in self._workers:
+            self._queue.put(None)
+        if wait:
+            for worker in self._workers:
+                worker.join()
@@ -1,35 +1,158 @@
+import atexit
+import json
 import logging
+import logging.handlers
+import os
+import queue
 import sys
+import threading
+from datetime import date, datetime, timedelta
+from typing import List, Optional
 from config import Config
 
-def setup_logger(name: str) -> logging.Logger:
-    """Set up logger with file and console handlers"""
-    logger = logging.getLogger(name)
-    logger.setLevel(getattr(logging, Config.LOG_LEVEL))
+_handlers: Optional[List[logging.Handler]] = None
+_queue_handler: Optional['LazyQueueHandler'] = None
+_listener: Optional[logging.handlers.QueueListener] = None
+_lock = threading.Lock()
+
+# Log argument types whose value can't change before the listener formats the record
+_IMMUTABLE_ARGS = (str, bytes, int, float, complex, type(None), date, timedelta)
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as one JSON object per line"""
     
-    # Avoid duplicate handlers
-    if logger.handlers:
-        return logger
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'file': f"{record.filename}:{record.lineno}",
+            'thread': record.threadName
+        }
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    """
+    Enqueue records as they are, leaving message formatting to the listener thread
+    The stock QueueHandler formats every record on the calling thread so it can be
+    pickled; records here stay in-process, so that work is deferred too. Records
+    with other arguments than immutable scalars (a dict or list the caller may
+    change right after the call) are still formatted here.
+    """
     
-    # Console handler
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        args = record.args
+        if not isinstance(record.msg, str) or (args and (
+                not isinstance(args, tuple) or not all(isinstance(arg, _IMMUTABLE_ARGS) for arg in args))):
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+
+def _build_handlers() -> List[logging.Handler]:
+    """The console and size-rotated file handlers shared by every logger"""
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setLevel(logging.INFO)
-    console_format = logging.Formatter(
+    console_handler.setFormatter(logging.Formatter(
         '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
         datefmt='%Y-%m-%d %H:%M:%S'
-    )
-    console_handler.setFormatter(console_format)
+    ))
     
-    # File handler
-    file_handler = logging.FileHandler(Config.LOG_FILE)
-    file_handler.setLevel(logging.DEBUG)
-    file_format = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(filename)s:%(lineno)d - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
+    file_handler = logging.handlers.RotatingFileHandler(
+        Config.LOG_FILE, maxBytes=Config.LOG_MAX_BYTES, backupCount=Config.LOG_BACKUP_COUNT
     )
-    file_handler.setFormatter(file_format)
+    file_handler.setLevel(logging.DEBUG)
+    if Config.LOG_FORMAT == 'json':
+        file_handler.setFormatter(JsonFormatter())
+    else:
+        file_handler.setFormatter(logging.Formatter(
+            '%(asctime)s - %(name)s - %(levelname)s - %(filename)s:%(lineno)d - %(message)s',
+            datefmt='%Y-%m-%d %H:%M:%S'
+        ))
+    return [console_handler, file_handler]
+
+
+def _start_listener():
+    """Start the background thread that writes queued records (called with _lock held)"""
+    global _listener
+    log_queue = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(log_queue, *_handlers, respect_handler_level=True)
+    _listener.start()
+    if _queue_handler is None:
+        return LazyQueueHandler(log_queue)
+    _queue_handler.queue = log_queue
+    return _queue_handler
+
+
+def _without_rotation(handler: logging.Handler) -> logging.Handler:
+    """A plain appending FileHandler in place of a RotatingFileHandler, with the same level and format"""
+    if not isinstance(handler, logging.handlers.RotatingFileHandler):
+        return handler
+    file_handler = logging.FileHandler(handler.baseFilename, delay=True)
+    file_handler.setLevel(handler.level)
+    file_handler.setFormatter(handler.formatter)
+    handler.close()
+    return file_handler
+
+
+def _restart_after_fork():
+    """
+    A forked child (e.g. an OCR worker process) inherits the queue but not the listener thread
+    The child's listener only appends to the log file: a rollover done by more
+    than one process would rename the file out from under the others. Only
+    the parent rotates it.
+    """
+    global _lock, _handlers
+    _lock = threading.Lock()
+    if _listener is not None:
+        _handlers = [_without_rotation(handler) for handler in _handlers]
+        _start_listener()
+
+
+def _get_handlers() -> List[logging.Handler]:
+    """Handlers to attach to a module logger, creating the shared ones on first use"""
+    global _handlers, _queue_handler
+    with _lock:
+        if _handlers is None:
+            _handlers = _build_handlers()
+        if not Config.LOG_QUEUE:
+            return _handlers
+        if _queue_handler is None:
+            _queue_handler = _start_listener()
+            atexit.register(shutdown_logging)
+            if hasattr(os, 'register_at_fork'):
+                os.register_at_fork(after_in_child=_restart_after_fork)
+        return [_queue_handler]
+
+
+def shutdown_logging():
+    """Write out every queued record and stop the background writer"""
+    global _listener
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+def setup_logger(name: str) -> logging.Logger:
+    """
+    Set up a module logger writing to the console and a rotating log file
+    With Config.LOG_QUEUE (the default) records are only enqueued on the calling
+    thread; one shared background thread formats and writes them.
+    """
+    logger = logging.getLogger(name)
+    logger.setLevel(getattr(logging, Config.LOG_LEVEL))
+    
+    # Avoid duplicate handlers
+    if logger.handlers:
+        return logger
     
-    logger.addHandler(console_handler)
-    logger.addHandler(file_handler)
+    for handler in _get_handlers():
+        logger.addHandler(handler)
     
     return logger
@@ -1,3 +1,6 @@
+from .alignment import MarkingAligner
+from .part_index import PartIndex
+from .reference import CompiledReference
 from .verifier import MarkingVerifier
 
-__all__ = ['MarkingVerifier']
+__all__ = ['MarkingAligner', 'PartIndex', 'CompiledReference', 'MarkingVerifier']
@@ -0,0 +1,170 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+import re
+
+from .part_index import normalize_part
+from .reference import CompiledReference
+
+# Characters OCR commonly reads in place of digits
+DIGIT_CONFUSIONS = str.maketrans({'O': '0', 'Q': '0', 'D': '0', 'I': '1', 'L': '1',
+                                  'Z': '2', 'S': '5', 'B': '8', 'G': '6'})
+
+# YYWW: two-digit year followed by a week from 01 to 53
+DATE_CODE_PATTERN = re.compile(r'(?<!\d)(\d{2})(0[1-9]|[1-4]\d|5[0-3])(?!\d)')
+FOUR_DIGITS_PATTERN = re.compile(r'\d{4}')
+
+# Longest package/temperature suffix (e.g. P, DR, PWR) allowed after a part number
+MAX_SUFFIX = 3
+
+
+def bounded_edit_distance(pattern: str, text: str, max_distance: int,
+                          match_prefix: bool = False) -> Optional[int]:
+    """
+    Levenshtein distance between pattern and text, or between pattern and the
+    closest prefix of text when match_prefix is set (a part number followed by
+    a package suffix). The rest of the text after that prefix is a suffix only
+    if it is at most MAX_SUFFIX characters and doesn't start with a digit, so
+    LM35 doesn't match LM358P. Runs the O(n*m) DP row by row and stops as soon
+    as a whole row exceeds max_distance.
+
+    Returns:
+        The distance, or None when it is greater than max_distance
+    """
+    min_end = len(text) - MAX_SUFFIX if match_prefix else len(text)
+    if len(pattern) - len(text) > max_distance or min_end - len(pattern) > max_distance:
+        return None
+    
+    previous = list(range(len(text) + 1))
+    for i, pattern_char in enumerate(pattern, start=1):
+        current = [i] + [0] * len(text)
+        row_min = i
+        for j, text_char in enumerate(text, start=1):
+            current[j] = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (pattern_char != text_char)
+            )
+            if current[j] < row_min:
+                row_min = current[j]
+        if row_min > max_distance:
+            return None
+        previous = current
+    
+    if match_prefix:
+        distance = min(
+            previous[end] for end in range(max(min_end, 0), len(text) + 1)
+            if end == len(text) or not text[end].isdigit()
+        )
+    else:
+        distance = previous[-1]
+    return distance if distance <= max_distance else None
+
+
+def group_lines(extracted_text: str, words: Optional[List[Dict]] = None) -> List[List[str]]:
+    """
+    Split OCR output into lines of tokens
+    Uses Tesseract's block/paragraph/line numbers when word data is available,
+    otherwise the text's own line breaks
+    """
+    if words:
+        lines = {}
+        for word in words:
+            key = (word.get('block', 0), word.get('par', 0), word.get('line', 0))
+            lines.setdefault(key, []).append(word['text'])
+        return [tokens for _, tokens in sorted(lines.items())]
+    return [line.split() for line in extracted_text.splitlines() if line.split()]
+
+
+class MarkingAligner:
+    """
+    Matches each expected marking field (part number, OEM prefix, date code)
+    against individual OCR tokens instead of the whole OCR string
+    """
+    
+    def __init__(self, max_error_rate: float = 0.5):
+        self.max_error_rate = max_error_rate
+    
+    @staticmethod
+    def _tokens(lines: List[List[str]]) -> List[Tuple[int, str]]:
+        """(line index, normalized token), including adjacent tokens joined within a line"""
+        tokens = []
+        for line_index, line in enumerate(lines):
+            words = [normalize_part(word) for word in line]
+            words = [word for word in words if word]
+            tokens.extend((line_index, word) for word in words)
+            tokens.extend((line_index, a + b) for a, b in zip(words, words[1:]))
+        return tokens
+    
+    def match_field(self, expected: str, tokens: List[Tuple[int, str]]) -> Dict:
+        """Find the token closest to an expected value"""
+        expected_key = normalize_part(expected)
+        best = {'expected': expected, 'matched': None, 'line': None, 'score': 0.0}
+        if not expected_key:
+            return best
+        
+        max_distance = int(len(expected_key) * self.max_error_rate)
+        for line_index, token in tokens:
+            distance = bounded_edit_distance(expected_key, token, max_distance, match_prefix=True)
+            if distance is None:
+                continue
+            score = 1 - distance / len(expected_key)
+            if score > best['score']:
+                best.update(matched=token, line=line_index, score=score)
+                if distance == 0:
+                    break
+            # Later tokens must now beat the best distance found so far
+            max_distance = min(max_distance, distance)
+        return best
+    
+    def part_scores(self, extracted_text: str, references: Sequence[CompiledReference],
+                    words: Optional[List[Dict]] = None) -> List[float]:
+        """The token-aligned part score of one text against each reference, as align scores 'part'"""
+        tokens = self._tokens(group_lines(extracted_text, words))
+        return [self.match_field(reference.part_number, tokens)['score'] for reference in references]
+    
+    @staticmethod
+    def match_date_code(tokens: List[Tuple[int, str]], exclude: Sequence[Dict] = ()) -> Dict:
+        """
+        Find a YYWW date code token; a four-digit token with an invalid week scores half
+        Tokens within a field match in exclude (the part number and OEM tokens)
+        are skipped, so the digits of LM2904 are not read as a date code.
+        """
+        matched = [(field['line'], field['matched']) for field in exclude if field['matched']]
+        best = {'expected': 'YYWW', 'matched': None, 'line': None, 'score': 0.0}
+        for line_index, token in tokens:
+            if any(line == line_index and token in field_token for line, field_token in matched):
+                continue
+            digits = token.translate(DIGIT_CONFUSIONS)
+            if DATE_CODE_PATTERN.fullmatch(digits):
+                return dict(best, matched=digits, line=line_index, score=1.0)
+            if best['score'] == 0 and FOUR_DIGITS_PATTERN.fullmatch(digits):
+                best.update(matched=digits, line=line_index, score=0.5)
+        return best
+    
+    def align(self, extracted_text: str, reference: CompiledReference,
+              words: Optional[List[Dict]] = None) -> Dict[str, Dict]:
+        """
+        Score each expected field independently
+
+        Returns:
+            Field name ('part', 'oem', 'date_code') -> expected, matched token,
+            line index and score between 0 and 1
+        """
+        tokens = self._tokens(group_lines(extracted_text, words))
+        fields = {'part': self.match_field(reference.part_number, tokens)}
+        
+        part_key = normalize_part(reference.part_number)
+        oem_patterns = [
+            pattern for pattern in reference.marking_patterns
+            if normalize_part(pattern) != part_key
+        ] or ([reference.oem_name[:3]] if reference.oem_name else [])
+        if oem_patterns:
+            fields['oem'] = max(
+                (self.match_field(pattern, tokens) for pattern in oem_patterns),
+                key=lambda field: field['score']
+            )
+        
+        if reference.data.get('date_code_format') == 'YYWW':
+            fields['date_code'] = self.match_date_code(
+                tokens, [field for field in fields.values() if field['score'] > 0]
+            )
+        return fields
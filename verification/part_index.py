@@ -0,0 +1,106 @@
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional
+import re
+import threading
+
+from fuzzywuzzy import fuzz
+from utils import setup_logger
+
+logger = setup_logger(__name__)
+
+
+def normalize_part(text: str) -> str:
+    """Uppercase and keep only letters and digits"""
+    return re.sub(r'[^A-Z0-9]', '', text.upper())
+
+
+def candidate_tokens(text: str) -> List[str]:
+    """
+    Normalized OCR tokens that could be a part number
+    Adjacent tokens are also joined, since OCR often splits a marking ("LM 358")
+    """
+    words = [normalize_part(word) for word in text.split()]
+    words = [word for word in words if word]
+    tokens = [word for word in words if len(word) >= 2]
+    tokens.extend(a + b for a, b in zip(words, words[1:]))
+    return tokens
+
+
+def token_score(text: str, part_number: str) -> int:
+    """Best fuzzy ratio between any candidate token of text and a part number"""
+    part_key = normalize_part(part_number)
+    if not part_key:
+        return 0
+    return max((fuzz.ratio(token, part_key) for token in candidate_tokens(text)), default=0)
+
+
+class PartIndex:
+    """
+    In-memory character n-gram index over known part numbers
+    Lookups only touch parts sharing an n-gram with the OCR text, then rescore
+    the best of those with a fuzzy ratio
+    """
+    
+    def __init__(self, n: int = 3):
+        self.n = n
+        self._postings = defaultdict(set)  # n-gram -> part keys
+        self._parts = {}  # part key -> {'part_number', 'oem_name'}
+        self._lock = threading.Lock()
+    
+    def _grams(self, key: str) -> set:
+        padded = f"^{key}$"
+        return {padded[i:i + self.n] for i in range(max(len(padded) - self.n + 1, 1))}
+    
+    def __len__(self) -> int:
+        return len(self._parts)
+    
+    def add(self, part_number: str, oem_name: Optional[str] = None):
+        """Add a known part (re-adding updates its OEM)"""
+        key = normalize_part(part_number or '')
+        if not key:
+            return
+        with self._lock:
+            if key not in self._parts:
+                for gram in self._grams(key):
+                    self._postings[gram].add(key)
+            if key not in self._parts or oem_name:
+                self._parts[key] = {'part_number': part_number, 'oem_name': oem_name}
+    
+    def lookup(self, text: str, k: int = 5, shortlist: int = 50) -> List[Dict]:
+        """
+        Return up to k known parts closest to any token of the OCR text
+        Each result has part_number, oem_name and score (0-100)
+        """
+        tokens = candidate_tokens(text)
+        if not tokens:
+            return []
+        
+        with self._lock:
+            # Shortlist parts by n-gram overlap (Dice coefficient) with each token
+            overlap = {}
+            for token in tokens:
+                token_grams = self._grams(token)
+                shared = Counter()
+                for gram in token_grams:
+                    shared.update(self._postings.get(gram, ()))
+                for key, count in shared.items():
+                    dice = 2 * count / (len(token_grams) + len(key) + 3 - self.n)
+                    overlap[key] = max(overlap.get(key, 0), dice)
+            best = sorted(overlap, key=overlap.get, reverse=True)[:max(shortlist, k)]
+            parts = {key: self._parts[key] for key in best}
+        
+        scored = [
+            dict(parts[key], score=max(fuzz.ratio(token, key) for token in tokens))
+            for key in best
+        ]
+        scored.sort(key=lambda candidate: candidate['score'], reverse=True)
+        return scored[:k]
+    
+    @classmethod
+    def build_from_db(cls, db_manager) -> 'PartIndex':
+        """Build an index from the part numbers known to the database"""
+        index = cls()
+        for part_number, oem_name in db_manager.get_known_parts():
+            index.add(part_number, oem_name)
+        logger.info("Built part index with %s parts", len(index))
+        return index
@@ -0,0 +1,25 @@
+from typing import Dict, List
+
+
+class CompiledReference:
+    """Reference marking data with its match keys normalized once for repeated verification"""
+    
+    def __init__(self, reference_data: Dict):
+        self.data = reference_data
+        self.part_number = reference_data.get('part_number', '')
+        self.oem_name = reference_data.get('oem_name', '')
+        self.marking_patterns: List[str] = list(reference_data.get('marking_patterns', []))
+        
+        self.part_key = self.part_number.upper()
+        self.oem_key = self.oem_name.upper()
+        self.pattern_keys = [pattern.upper() for pattern in self.marking_patterns]
+    
+    def matching_patterns(self, text_key: str) -> List[str]:
+        """Marking patterns contained in an already uppercased text"""
+        return [
+            pattern for pattern, key in zip(self.marking_patterns, self.pattern_keys)
+            if key in text_key
+        ]
+    
+    def __repr__(self):
+        return f"<CompiledReference(part_number={self.part_number}, oem={self.oem_name})>"
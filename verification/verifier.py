@@ -1,15 +1,31 @@
-from typing import Dict, List
+from typing import Dict, List, Optional, Sequence, Union
 from difflib import SequenceMatcher
+import numpy as np
 from fuzzywuzzy import fuzz
 from config import Config
-from utils import setup_logger
+from utils import setup_logger, REGISTRY, timed
+from .alignment import MarkingAligner
+from .part_index import normalize_part, token_score
+from .reference import CompiledReference
+
+try:
+    from rapidfuzz import fuzz as rapidfuzz_fuzz, process as rapidfuzz_process
+except ImportError:  # fall back to per-pair fuzzywuzzy scoring
+    rapidfuzz_fuzz = rapidfuzz_process = None
 
 logger = setup_logger(__name__)
 
+VERIFICATIONS = REGISTRY.counter('ic_verifications_total', "Marking verifications by status", ['status'])
+
+def _difference(field: str, code: str, message: str) -> Dict:
+    """A structured difference: the marking field it concerns, a stable code and the message shown"""
+    return {'field': field, 'code': code, 'message': message}
+
 class MarkingVerifier:
     def __init__(self):
         self.similarity_threshold = Config.SIMILARITY_THRESHOLD
         self.fuzzy_threshold = Config.FUZZY_MATCH_THRESHOLD
+        self.aligner = MarkingAligner()
     
     def calculate_similarity(self, text1: str, text2: str) -> float:
         """Calculate similarity between two strings"""
@@ -19,23 +35,37 @@ class MarkingVerifier:
         """Calculate fuzzy match score"""
         return fuzz.ratio(text1.upper(), text2.upper())
     
-    def verify_marking(self, extracted_text: str, reference_data: Dict) -> Dict:
-        """Verify extracted marking against reference data"""
-        part_number = reference_data.get('part_number', '')
-        oem_name = reference_data.get('oem_name', '')
-        marking_patterns = reference_data.get('marking_patterns', [])
+    def compile_reference(self, reference_data: Union[Dict, CompiledReference]) -> CompiledReference:
+        """Normalize reference data once so it can be verified against many texts"""
+        if isinstance(reference_data, CompiledReference):
+            return reference_data
+        return CompiledReference(reference_data)
+    
+    @timed('verify')
+    def verify_marking(self, extracted_text: str, reference_data: Union[Dict, CompiledReference],
+                       candidates: Optional[List[Dict]] = None,
+                       words: Optional[List[Dict]] = None) -> Dict:
+        """
+        Verify extracted marking against reference data (a dict or CompiledReference)
+        candidates are known parts from PartIndex.lookup; a different part matching
+        the marking clearly better than the claimed one is flagged as a relabel.
+        words are the OCR word boxes, used to align each expected field with its own token.
+        """
+        reference = self.compile_reference(reference_data)
+        text_key = extracted_text.upper()
+        field_scores = self.aligner.align(extracted_text, reference, words)
         
-        # Check for part number match
-        part_similarity = self.fuzzy_match(extracted_text, part_number)
+        # Check for part number match, either across the whole text or on its best token
+        part_similarity = max(
+            fuzz.ratio(text_key, reference.part_key),
+            round(field_scores['part']['score'] * 100)
+        )
         
         # Check for OEM name match
-        oem_similarity = self.fuzzy_match(extracted_text, oem_name)
+        oem_similarity = fuzz.ratio(text_key, reference.oem_key)
         
         # Check for marking patterns
-        pattern_matches = []
-        for pattern in marking_patterns:
-            if pattern.upper() in extracted_text.upper():
-                pattern_matches.append(pattern)
+        pattern_matches = reference.matching_patterns(text_key)
         
         # Calculate overall confidence
         confidence = max(part_similarity, oem_similarity) / 100.0
@@ -50,11 +80,32 @@ class MarkingVerifier:
         
         differences = []
         if part_similarity < 90:
-            differences.append(f"Part number mismatch (similarity: {part_similarity}%)")
+            differences.append(_difference(
+                'part', 'part_mismatch', f"Part number mismatch (similarity: {part_similarity}%)"
+            ))
         if not pattern_matches:
-            differences.append("Expected marking patterns not found")
+            differences.append(_difference('patterns', 'patterns_missing', "Expected marking patterns not found"))
+        date_code = field_scores.get('date_code')
+        if date_code and date_code['score'] < 1:
+            if date_code['matched']:
+                differences.append(_difference(
+                    'date_code', 'date_code_invalid', f"Invalid date code {date_code['matched']} (expected YYWW)"
+                ))
+            else:
+                differences.append(_difference('date_code', 'date_code_missing', "Date code not found"))
+        
+        relabel_suspect = self.find_better_match(extracted_text, reference.part_number, candidates or [])
+        if relabel_suspect:
+            differences.append(_difference(
+                'part', 'relabel_suspect',
+                f"Marking matches {relabel_suspect['part_number']} better than "
+                f"{reference.part_number} (score: {relabel_suspect['score']}%)"
+            ))
+            if status == "GENUINE":
+                status = "UNCERTAIN"
         
-        logger.info(f"Verification complete: {status} (confidence: {confidence:.2f})")
+        logger.info("Verification complete: %s (confidence: %.2f)", status, confidence)
+        VERIFICATIONS.inc(status=status)
         
         return {
             'status': status,
@@ -62,5 +113,64 @@ class MarkingVerifier:
             'part_similarity': part_similarity,
             'oem_similarity': oem_similarity,
             'pattern_matches': pattern_matches,
-            'differences': differences
+            'field_scores': field_scores,
+            'differences': [difference['message'] for difference in differences],
+            'difference_details': differences,
+            'candidates': candidates or [],
+            'relabel_suspect': relabel_suspect['part_number'] if relabel_suspect else None
         }
+    
+    def find_better_match(self, extracted_text: str, claimed_part: str, candidates: List[Dict]) -> Optional[Dict]:
+        """Return the best candidate part that matches the marking clearly better than the claimed part"""
+        claimed_key = normalize_part(claimed_part)
+        others = [c for c in candidates if normalize_part(c['part_number']) != claimed_key]
+        if not others:
+            return None
+        
+        best = max(others, key=lambda c: c['score'])
+        claimed_score = token_score(extracted_text, claimed_part)
+        if best['score'] >= Config.PART_ID_MIN_SCORE and best['score'] >= claimed_score + Config.RELABEL_MARGIN:
+            return best
+        return None
+    
+    def similarity_matrix(self, texts: Sequence[str], keys: Sequence[str]) -> np.ndarray:
+        """
+        fuzz.ratio of every uppercased text against every (already uppercased) key
+        Returns an N x M integer matrix, computed by rapidfuzz in parallel when available
+        """
+        text_keys = [text.upper() for text in texts]
+        if rapidfuzz_process is not None:
+            scores = rapidfuzz_process.cdist(
+                text_keys, list(keys), scorer=rapidfuzz_fuzz.ratio, dtype=np.float32, workers=-1
+            )
+            # Round like fuzzywuzzy, which returns whole percentages
+            return np.rint(scores).astype(np.int32)
+        
+        scores = np.zeros((len(text_keys), len(keys)), dtype=np.int32)
+        for i, text_key in enumerate(text_keys):
+            for j, key in enumerate(keys):
+                scores[i, j] = fuzz.ratio(text_key, key)
+        return scores
+    
+    def score_matrix(self, texts: Sequence[str],
+                     references: Sequence[Union[Dict, CompiledReference]],
+                     words: Optional[Sequence[Optional[List[Dict]]]] = None) -> np.ndarray:
+        """
+        Score N extracted texts against M references in one pass
+        Returns an N x M matrix of the confidences verify_marking would give: the
+        part score is the better of the whole-string and token-aligned scores.
+        words are the OCR word boxes of each text, as for verify_marking.
+        """
+        compiled = [self.compile_reference(reference) for reference in references]
+        if not texts or not compiled:
+            return np.zeros((len(texts), len(compiled)), dtype=np.float64)
+        
+        part_scores = self.similarity_matrix(texts, [reference.part_key for reference in compiled])
+        aligned_scores = np.array([
+            self.aligner.part_scores(text, compiled, words[i] if words else None)
+            for i, text in enumerate(texts)
+        ])
+        part_scores = np.maximum(part_scores, np.rint(aligned_scores * 100).astype(np.int32))
+        oem_scores = self.similarity_matrix(texts, [reference.oem_key for reference in compiled])
+        logger.info("Scored %s texts against %s references", len(texts), len(compiled))
+        return np.maximum(part_scores, oem_scores) / 100.0